@@ -0,0 +1,182 @@
+#!/usr/bin/python3
+
+import sys, os, re, time, json, random, tempfile, subprocess, platform
+import synthetic
+
+script_path = os.path.realpath(__file__)
+path = os.path.dirname(script_path)
+
+conf = {
+    'python' : sys.executable,
+    'jumps' : 200,
+    'lines' : 500,
+    'repaints' : 50,
+    'width' : 80,
+    'height' : 25
+}
+
+results = {}
+
+#get the values below which half and 99% of the times fall, in ms
+def get_percentiles(times):
+    times = sorted(times)
+    return {
+        'p50' : times[len(times) // 2]*1000,
+        'p99' : times[min(int(len(times)*0.99), len(times) - 1)]*1000,
+        'mean' : sum(times)*1000/len(times)
+    }
+
+#run a setup script on a file, returning its time (s) and peak memory (kB)
+def run_script(name, input_path, data_path):
+    input_file = open(input_path, 'rb')
+    start = time.perf_counter()
+    process = subprocess.Popen([conf['python'], os.path.join(path, name), "dir=" + data_path], stdin=input_file, stdout=subprocess.DEVNULL)
+    pid, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    input_file.close()
+    if status != 0:
+        print(name + " failed", file=sys.stderr)
+        sys.exit(1)
+    return (elapsed, usage.ru_maxrss)
+
+def bench_pack(fasta_path, data_path):
+    elapsed, memory = run_script("condense.py", fasta_path, data_path)
+    size = os.path.getsize(fasta_path)
+    results['pack'] = {
+        'seconds' : elapsed,
+        'MB/s' : size / elapsed / 1000000,
+        'peak kB' : memory
+    }
+
+def bench_annotate(gff_path, data_path):
+    elapsed, memory = run_script("comment.py", gff_path, data_path)
+    with open(gff_path) as gff_file:
+        features = sum(1 for line in gff_file if line[0] != '#')
+    results['annotate'] = {
+        'seconds' : elapsed,
+        'features/s' : features / elapsed,
+        'peak kB' : memory
+    }
+
+#time Reader.jump_to() to random positions of the first chromosome
+def bench_jump(rng, viewer):
+    ch = synthetic.conf['chromosomes'][0]
+    reader = viewer.Reader(ch, 1)
+    times = []
+    for n in range(0, conf['jumps']):
+        pos = rng.randint(1, reader.ch_size)
+        start = time.perf_counter()
+        reader.jump_to(pos)
+        times.append(time.perf_counter() - start)
+    results['jump'] = get_percentiles(times)
+
+#time scrolling a number of lines down, then up, from a random position
+def bench_scroll(rng, viewer, headless):
+    ch = synthetic.conf['chromosomes'][0]
+    size = viewer.Reader(ch, 1).ch_size
+    view, screen = headless.make_view(ch, rng.randint(1, size // 2), conf['width'], conf['height'])
+    for name, scroll in (('scroll down', view.scroll_down), ('scroll up', view.scroll_up)):
+        #decode the lines again on the way up, rather than take them from the row cache
+        view.row_cache.clear()
+        times = []
+        for n in range(0, conf['lines']):
+            start = time.perf_counter()
+            scroll(1)
+            times.append(time.perf_counter() - start)
+        results[name] = get_percentiles(times)
+        results[name]['lines/s'] = len(times) / sum(times)
+
+#time full repaints at random positions
+def bench_fill(rng, viewer, headless):
+    ch = synthetic.conf['chromosomes'][0]
+    view, screen = headless.make_view(ch, 1, conf['width'], conf['height'])
+    times = []
+    for n in range(0, conf['repaints']):
+        view.goto(ch, rng.randint(1, view.top_pos.reader.ch_size))
+        view.rows = []
+        start = time.perf_counter()
+        view.fill(x=0, y=0, h=conf['height'])
+        times.append(time.perf_counter() - start)
+    results['fill'] = get_percentiles(times)
+
+def get_commit():
+    try:
+        return subprocess.check_output(["git", "-C", path, "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#print results, with the change from an earlier run if given
+def print_results(previous=None):
+    for name, values in results.items():
+        parts = []
+        for key, value in values.items():
+            part = "{} {:.3f}".format(key, value) if isinstance(value, float) else "{} {}".format(key, value)
+            if previous and key in previous.get(name, {}) and previous[name][key]:
+                part += " ({:+.1f}%)".format((value / previous[name][key] - 1)*100)
+            parts.append(part)
+        print("{}: {}".format(name, ", ".join(parts)))
+
+def run(work_path):
+    fasta_path = os.path.join(work_path, "sequence.fna")
+    gff_path = os.path.join(work_path, "annotations.gff")
+    data_path = os.path.join(work_path, "data")
+    os.makedirs(data_path, exist_ok=True)
+    start = time.perf_counter()
+    synthetic.generate(fasta_path, gff_path)
+    results['generate'] = {'seconds' : time.perf_counter() - start}
+    bench_pack(fasta_path, data_path)
+    bench_annotate(gff_path, data_path)
+
+    import viewer, headless
+    viewer.path = data_path
+    rng = random.Random(synthetic.conf['seed'])
+    bench_jump(rng, viewer)
+    bench_scroll(rng, viewer, headless)
+    bench_fill(rng, viewer, headless)
+
+def main():
+    synthetic.parse_options()
+    work_path = None
+    out_path = "benchmark.json"
+    compare_path = None
+    for arg in sys.argv[1:]:
+        match = re.fullmatch(r'(jumps|lines|repaints|width|height)=(\d+)', arg)
+        if match:
+            conf[match.group(1)] = int(match.group(2))
+        match = re.fullmatch(r'python=(.+)', arg)
+        if match:
+            conf['python'] = match.group(1)
+        match = re.fullmatch(r'dir=(.+)', arg)
+        if match:
+            work_path = match.group(1)
+        match = re.fullmatch(r'out=(.+)', arg)
+        if match:
+            out_path = match.group(1)
+        match = re.fullmatch(r'compare=(.+)', arg)
+        if match:
+            compare_path = match.group(1)
+
+    if work_path:
+        os.makedirs(work_path, exist_ok=True)
+        run(work_path)
+    else:
+        with tempfile.TemporaryDirectory() as work_path:
+            run(work_path)
+
+    previous = None
+    if compare_path:
+        with open(compare_path) as compare_file:
+            previous = json.load(compare_file)['results']
+    print_results(previous)
+    with open(out_path, 'w') as out_file:
+        json.dump({
+            'commit' : get_commit(),
+            'date' : time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python' : platform.python_implementation() + " " + platform.python_version(),
+            'genome' : synthetic.conf,
+            'settings' : conf,
+            'results' : results
+        }, out_file, indent=1)
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,9 @@
 #!/usr/bin/pypy3
 
 import sys, os, re, bisect
+from features import feature_encode, get_max_ends, write_array
 
-feature_encode = {
-    'gap' : 0,
-    'exon' : 1,
-    'CDS' : 2,
-    'pseudogene' : 3,
-    'gene' : 4,
-    'tRNA' : 5,
-    'rRNA' : 6,
-    'miRNA' : 7
-} # 0-63
+#GFF types not in feature_encode are dropped; codes are 0-63
 end_encode = 128
 
 strand_encode = {
@@ -22,12 +14,20 @@ strand_encode = {
 
 script_path = os.path.realpath(__file__)
 path = os.path.dirname(script_path)
+#data files can be written to another directory with dir=<path>
+for arg in sys.argv[1:]:
+    match = re.fullmatch(r'dir=(.+)', arg)
+    if match:
+        path = os.path.realpath(match.group(1))
 
 current_ch = None
 ch_files = {}
 ch_arr_pos = {}
 ch_arr_feat = {}
 ch_arr_info = {}
+ch_features = {}
+
+gene_names = []
 
 pattern_seqid = re.compile(r'NC_(\d+)')
 pattern_info_description = re.compile(r';description=([^;]*);')
@@ -39,6 +39,52 @@ def insert_feature(pos, feat, info=None):
     ch_arr_feat[current_ch].insert(index, feat)
     ch_arr_info[current_ch].insert(index, info)
 
+#add a gene to the name index, sorted by name (case-insensitive) and location
+def add_gene_name(seqid, pos, endpos, fields):
+    match = pattern_info_name.search(fields[8])
+    if not match:
+        return
+    name = match.group(1)
+    gene_names.append((name.upper(), seqid, pos, name, current_ch, endpos, strand_encode[fields[6]]))
+
+#get extra info about a feature as stored in the feature index (gene name, CDS phase)
+def get_index_info(feat, info):
+    if feat == feature_encode['gene']:
+        return info[2:-1] if info else None
+    elif feat == feature_encode['CDS']:
+        return str(info[0]).encode()
+    return None
+
+#sort features by start and compute the implicit interval tree over them
+def index_features(features):
+    features.sort(key=lambda feature: feature[0:3])
+    return get_max_ends(features)
+
+#feature index: count, then columns (starts, ends, max ends, types, strands,
+#info offsets), then info strings
+def write_feature_index(ch):
+    features = ch_features[ch]
+    max_ends = index_features(features)
+    info_offsets = []
+    info_block = bytearray()
+    for feature in features:
+        if feature[4] is None:
+            info_offsets.append(0xffffffff)
+        else:
+            info_offsets.append(len(info_block))
+            info_block += feature[4] + b'\0'
+    index_path = os.path.join(path, ch + ".fti")
+    index_file = open(index_path, 'wb')
+    index_file.write(len(features).to_bytes(4, byteorder='little', signed=False))
+    write_array(index_file, [feature[0] for feature in features])
+    write_array(index_file, [feature[1] for feature in features])
+    write_array(index_file, max_ends)
+    index_file.write(bytes([feature[2] for feature in features]))
+    index_file.write(bytes([feature[3] for feature in features]))
+    write_array(index_file, info_offsets)
+    index_file.write(info_block)
+    index_file.close()
+
 def get_feature_info(feat, fields):
     if feat == feature_encode['gene']:
         match = pattern_info_description.search(fields[8])
@@ -81,6 +127,7 @@ for line in sys.stdin:
             ch_arr_pos[current_ch] = []
             ch_arr_feat[current_ch] = []
             ch_arr_info[current_ch] = []
+            ch_features[current_ch] = []
             if current_ch == 'mt':
                 print("Mitochondrial")
             else:
@@ -93,6 +140,9 @@ for line in sys.stdin:
         info = get_feature_info(feat, fields)
         insert_feature(pos, feat, info)
         insert_feature(endpos, feat | end_encode)
+        ch_features[current_ch].append((pos, endpos, feat, strand_encode[fields[6]], get_index_info(feat, info)))
+        if feat == feature_encode['gene'] or feat == feature_encode['pseudogene']:
+            add_gene_name(int(match.group(1)), pos, endpos - 1, fields)
 
 print("Annotating gaps and saving...")
 for ch in ch_files.keys():
@@ -107,6 +157,7 @@ for ch in ch_files.keys():
         if gap_end != 0:
             insert_feature(gap_start, feature_encode['gap'])
             insert_feature(gap_end, feature_encode['gap'] | end_encode)
+            ch_features[ch].append((gap_start, gap_end, feature_encode['gap'], strand_encode['.'], None))
         gap_start = gap_file.read(4)
         gap_end = gap_file.read(4)
 
@@ -117,4 +168,25 @@ for ch in ch_files.keys():
         if ch_arr_info[ch][n]:
             file.write(ch_arr_info[ch][n])
             file.write(ch_arr_feat[ch][n].to_bytes(1, byteorder='little', signed=False))
+    write_feature_index(ch)
+
+#gene index: count, record offsets, then records (name, chromosome, start, end, strand)
+print("Indexing gene names...")
+gene_names.sort()
+index_path = os.path.join(path, "genes.idx")
+index_file = open(index_path, 'wb')
+index_file.write(len(gene_names).to_bytes(4, byteorder='little', signed=False))
+offset = 4 + 4*len(gene_names)
+records = []
+for key, seqid, pos, name, ch, endpos, strand in gene_names:
+    record = name.encode() + b'\0' + ch.encode() + b'\0'
+    record += pos.to_bytes(4, byteorder='little', signed=False)
+    record += endpos.to_bytes(4, byteorder='little', signed=False)
+    record += strand.to_bytes(1, byteorder='little', signed=False)
+    index_file.write(offset.to_bytes(4, byteorder='little', signed=False))
+    records.append(record)
+    offset += len(record)
+for record in records:
+    index_file.write(record)
+index_file.close()
 print("Done!")
@@ -97,6 +97,11 @@ wildcard_nucleotides = ['B', 'D', 'H', 'K', 'M', 'N', 'R', 'S', 'V', 'W', 'Y']
 
 script_path = os.path.realpath(__file__)
 path = os.path.dirname(script_path)
+#data files can be written to another directory with dir=<path>
+for arg in sys.argv[1:]:
+    match = re.fullmatch(r'dir=(.+)', arg)
+    if match:
+        path = os.path.realpath(match.group(1))
 
 current_ch = None
 last_ch = None
@@ -108,8 +113,36 @@ ch_progress = {}
 gap_files = {}
 gap_starts = {}
 
+mask_files = {}
+mask_starts = {}
+mask_last_end = {}
+
 pattern_chromosome = re.compile(r'>.+?Homo sapiens chromosome ([1-9XY]|1\d|2[0-2]), GRCh.+?Primary Assembly')
 pattern_mitichondrial = re.compile(r'>.+?Homo sapiens mitochondrion, complete genome')
+pattern_lowercase = re.compile(r'[a-z]+')
+
+#write a soft-masked interval [start, end) as deltas from the previous one
+def write_mask(ch, start, end):
+    mask_files[ch].write((start - mask_last_end[ch]).to_bytes(4, byteorder='little', signed=False))
+    mask_files[ch].write((end - start).to_bytes(4, byteorder='little', signed=False))
+    mask_last_end[ch] = end
+
+#record lowercase (soft-masked) runs of a line, merging runs that continue across lines
+def mask_line(ch, line):
+    base = ch_lengths[ch]
+    if ch in mask_starts and not line[:1].islower():
+        write_mask(ch, mask_starts[ch], base + 1)
+        del mask_starts[ch]
+    for match in pattern_lowercase.finditer(line):
+        start = base + match.start() + 1
+        end = base + match.end() + 1
+        if match.start() == 0 and ch in mask_starts:
+            start = mask_starts[ch]
+            del mask_starts[ch]
+        if match.end() == len(line):
+            mask_starts[ch] = start
+        else:
+            write_mask(ch, start, end)
 
 def close_current_chromosome(ch):
     if not ch:
@@ -120,6 +153,10 @@ def close_current_chromosome(ch):
     ch_files[ch].seek(0)
     ch_files[ch].write(ch_lengths[ch].to_bytes(4, byteorder='little', signed=False))
     ch_files[ch].close()
+    if ch in mask_starts:
+        write_mask(ch, mask_starts[ch], ch_lengths[ch] + 1)
+        del mask_starts[ch]
+    mask_files[ch].close()
     if ch in gap_starts:
         gap_files[ch].write((ch_lengths[ch]+1).to_bytes(4, byteorder='little', signed=False))
         del gap_starts[ch]
@@ -151,7 +188,12 @@ for line in sys.stdin:
                 ch_lengths[current_ch] = 0
                 ch_bytes[current_ch] = 0
                 ch_progress[current_ch] = -1
+                current_mask_path = os.path.join(path, current_ch + ".msk")
+                mask_files[current_ch] = open(current_mask_path, 'wb')
+                mask_last_end[current_ch] = 0
             ba = bytearray()
+            line = line.rstrip()
+            mask_line(current_ch, line)
             line = line.upper()
             for c in line:
                 if c in nucleotide_encoding:
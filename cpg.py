@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+
+import os, sys, re, itertools, operator
+import sequence, tracks, kmers
+
+numpy = kmers.numpy
+
+#translation tables from 2-bit codes to whether they are C, or G
+c_table = bytes([0, 1, 0, 0]) + bytes(252)
+g_table = bytes([0, 0, 1, 0]) + bytes(252)
+
+#windows with at least this much GC and this ratio of observed to expected CpG,
+#merged and at least length bases long, are islands (Gardiner-Garden and Frommer)
+conf = {
+    'window' : 200,
+    'gc' : 0.5,
+    'ratio' : 0.6,
+    'length' : 200,
+    'processes' : os.cpu_count() or 1,
+    'chromosomes' : sequence.chromosomes,
+    'name' : "cpg-islands"
+}
+
+#check the windows over positions start to end, returning runs of passing windows as
+#(first window start, last window start), relative to start
+def numpy_scan(seq, start, end):
+    w = conf['window']
+    codes = kmers.numpy_codes(seq, start, end)
+    is_c = codes == 1
+    is_g = codes == 2
+    c_sums = numpy.concatenate(([0], numpy.cumsum(is_c, dtype=numpy.int64)))
+    g_sums = numpy.concatenate(([0], numpy.cumsum(is_g, dtype=numpy.int64)))
+    cpg_sums = numpy.concatenate(([0], numpy.cumsum(is_c[:-1] & is_g[1:], dtype=numpy.int64)))
+    n = len(codes) - w + 1
+    C = c_sums[w:] - c_sums[:n]
+    G = g_sums[w:] - g_sums[:n]
+    CG = cpg_sums[w-1:w-1 + n] - cpg_sums[:n]
+    passing = numpy.flatnonzero(((C + G) >= conf['gc']*w) & (CG*w >= conf['ratio']*C*G) & (C*G > 0))
+    if len(passing) == 0:
+        return []
+    breaks = numpy.flatnonzero(numpy.diff(passing) > 1)
+    firsts = numpy.concatenate(([passing[0]], passing[breaks + 1]))
+    lasts = numpy.concatenate((passing[breaks], [passing[-1]]))
+    return list(zip(firsts.tolist(), lasts.tolist()))
+
+#same, a window at a time, without NumPy
+def python_scan(seq, start, end):
+    w = conf['window']
+    codes = seq.get_codes(start, end)
+    is_c = codes.translate(c_table)
+    is_g = codes.translate(g_table)
+    c_sums = list(itertools.accumulate(is_c, initial=0))
+    g_sums = list(itertools.accumulate(is_g, initial=0))
+    cpg_sums = list(itertools.accumulate(map(operator.and_, is_c, is_g[1:]), initial=0))
+    gc = conf['gc']*w
+    ratio = conf['ratio']
+    runs = []
+    for i in range(0, len(codes) - w + 1):
+        C = c_sums[i + w] - c_sums[i]
+        G = g_sums[i + w] - g_sums[i]
+        if C + G < gc or C*G == 0 or (cpg_sums[i + w-1] - cpg_sums[i])*w < ratio*C*G:
+            continue
+        if runs and runs[-1][1] == i - 1:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+    return runs
+
+#describe an island by its GC content and observed/expected CpG ratio
+def get_island_name(seq, start, end):
+    codes = seq.get_codes(start, end - 1)
+    C = codes.count(1)
+    G = codes.count(2)
+    CG = codes.count(b"\x01\x02")
+    return "GC {:.0f}% o/e {:.2f}".format((C + G)*100/len(codes), CG*len(codes)/(C*G) if C*G else 0)
+
+#find the islands of a chromosome and write them as its part of the track (run in a worker process)
+def find_islands(args):
+    ch, data_path, settings = args
+    sequence.path = tracks.path = data_path
+    conf.update(settings)
+    seq = sequence.Sequence.get_ch_sequence(ch)
+    w = conf['window']
+    islands = []
+    for start, end in kmers.iter_chunks(seq, w):
+        for first, last in (numpy_scan if numpy else python_scan)(seq, start, end):
+            island_start = start + first
+            island_end = start + last + w
+            #chunks overlap, so islands found in both are merged here
+            if islands and island_start <= islands[-1][1]:
+                islands[-1][1] = max(islands[-1][1], island_end)
+            else:
+                islands.append([island_start, island_end])
+    intervals = [(start, end, get_island_name(seq, start, end)) for start, end in islands if end - start >= conf['length']]
+    if intervals:
+        tracks.write_track_index(tracks.get_track_path(conf['name']), ch, intervals)
+    return len(intervals)
+
+#find the islands of the chromosomes in conf, one worker process per chromosome
+def find_all():
+    chromosomes = kmers.get_chromosomes(conf)
+    tracks.clear_track(conf['name'])
+    return sum(kmers.map_chromosomes(find_islands, chromosomes, conf))
+
+def parse_options():
+    data_path = kmers.parse_chromosome_options(conf)
+    if data_path:
+        sequence.path = tracks.path = data_path
+    for arg in sys.argv[1:]:
+        match = re.fullmatch(r'(window|length)=(\d+)', arg)
+        if match:
+            conf[match.group(1)] = int(match.group(2))
+        match = re.fullmatch(r'(gc|ratio)=([\d.]+)', arg)
+        if match:
+            conf[match.group(1)] = float(match.group(2))
+        match = re.fullmatch(r'name=([\w-]+)', arg)
+        if match:
+            conf['name'] = match.group(1)
+
+if __name__ == '__main__':
+    parse_options()
+    if not numpy:
+        print("NumPy not found, the search will be slow")
+    count = find_all()
+    print("{} CpG islands in track {}".format(count, conf['name']))
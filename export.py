@@ -0,0 +1,234 @@
+#!/usr/bin/python3
+
+import sys, re, io
+import viewer, genes, sequence, liftover
+
+#nucleotides rendered per chunk written to the output
+chunk_size = 65536
+#nucleotides kept back from each chunk, so that highlights can still reach them
+chunk_keep = 16
+
+html_header = "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{}</title></head>\n<body style=\"background:#000000;color:#c0c0c0\"><pre>\n"
+html_footer = "</pre></body></html>\n"
+
+#RGB values of the 256-color palette, as assigned by viewer.convert_color()
+def color_rgb(index):
+    basic = [
+        (0, 0, 0), (128, 0, 0), (0, 128, 0), (128, 128, 0),
+        (0, 0, 128), (128, 0, 128), (0, 128, 128), (192, 192, 192),
+        (128, 128, 128), (255, 0, 0), (0, 255, 0), (255, 255, 0),
+        (0, 0, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255)
+    ]
+    if index < 16:
+        return basic[index]
+    if index >= 232:
+        V = 8 + (index - 232)*10
+        return (V, V, V)
+    steps = [0, 95, 135, 175, 215, 255]
+    index -= 16
+    return (steps[index // 36], steps[(index // 6) % 6], steps[index % 6])
+
+#get the (foreground, background) colors of every pair, as set up by viewer.main()
+def get_pair_colors():
+    pair_colors = {viewer.PAIR_UNK : (-1, -1)}
+    for pair, background in viewer.region_colors.items():
+        for offset, foreground in viewer.nucleotide_colors.items():
+            pair_colors[pair + offset] = (foreground, background)
+    pair_colors[viewer.PAIR_HIGHLIGHT] = (0, viewer.other_colors[viewer.PAIR_HIGHLIGHT])
+    return pair_colors
+
+#get the ANSI escape sequence for a pair and attribute
+def ansi_style(colors, dim):
+    codes = ["0"]
+    if dim:
+        codes.append("2")
+    if colors[0] >= 0:
+        codes.append("38;5;{}".format(colors[0]))
+    if colors[1] >= 0:
+        codes.append("48;5;{}".format(colors[1]))
+    return "\x1b[" + ";".join(codes) + "m"
+
+#get the opening HTML tag for a pair and attribute
+def html_style(colors, dim):
+    styles = []
+    if colors[0] >= 0:
+        styles.append("color:#{:02x}{:02x}{:02x}".format(*color_rgb(colors[0])))
+    if colors[1] >= 0:
+        styles.append("background:#{:02x}{:02x}{:02x}".format(*color_rgb(colors[1])))
+    if dim:
+        styles.append("opacity:0.5")
+    return "<span style=\"" + ";".join(styles) + "\">"
+
+#a view that renders into a stream instead of a curses screen
+class ExportView(viewer.View):
+    def __init__(self, reader, out, html=False, width=80):
+        viewer.View.__init__(self, reader, None)
+        self.out = out
+        self.html = html
+        self.width = width
+        self.current_cds_phase = None
+        self.current_cds_feat_pos = None
+        self.pair_colors = get_pair_colors()
+        #rendered but not yet written cells, as (nucleotide, pair, dim, character)
+        self.cells = []
+        #last written nucleotides, for highlighting
+        self.before = list(reader.last_nucleotides)[:-1]
+        self.column = 0
+        self.style = None
+        #(nucleotide, pair) of every written cell, if a list
+        self.written = None
+
+    #write the rendered cells, except for the last <keep>
+    def flush(self, keep=0):
+        parts = []
+        count = len(self.cells) - keep
+        flags = None
+        if True in viewer.highlight.values():
+            flags = viewer.find_highlights(self.before + [cell[0] for cell in self.cells])[len(self.before):]
+        for n in range(0, count):
+            nucleotide, pair, dim, char = self.cells[n]
+            if self.written is not None:
+                self.written.append((nucleotide, pair))
+            if flags and flags[n]:
+                pair = viewer.PAIR_HIGHLIGHT
+            style = (pair, dim)
+            if style != self.style:
+                if self.html:
+                    if self.style is not None:
+                        parts.append("</span>")
+                    parts.append(html_style(self.pair_colors[pair], dim))
+                else:
+                    parts.append(ansi_style(self.pair_colors[pair], dim))
+                self.style = style
+            parts.append(char)
+            self.column += 1
+            if self.column == self.width:
+                if self.html:
+                    parts.append("</span>\n")
+                else:
+                    parts.append("\x1b[0m\n")
+                self.column = 0
+                self.style = None
+        if keep == 0 and self.column != 0:
+            parts.append("</span>\n" if self.html else "\x1b[0m\n")
+            self.column = 0
+            self.style = None
+        self.out.write("".join(parts))
+        self.before = (self.before + [cell[0] for cell in self.cells[0:count]])[-20:]
+        self.cells = self.cells[count:]
+
+    #render positions start to end of the reader's chromosome, in chunks
+    def export(self, start, end):
+        reader = self.top_pos.reader
+        if self.html:
+            self.out.write(html_header.format("{}.{}-{}".format(reader.ch, start, end)))
+        pos = start
+        while pos <= end:
+            chunk_end = min(pos + chunk_size, end + 1)
+            masked = []
+            if viewer.display['dim repeats']:
+                masked = reader.get_masked_intervals(pos, chunk_end)
+            amino = None
+            if viewer.display['translate']:
+                amino = sequence.translation_track(reader.ch, pos, chunk_end - 1)
+            chunk_start = pos
+            m = 0
+            while pos < chunk_end:
+                nucleotide, pair = self.get_nucleotide_and_pair(reader)
+                while m < len(masked) and masked[m][1] <= pos:
+                    m += 1
+                dim = m < len(masked) and masked[m][0] <= pos
+                char = viewer.nucleotide_decoding[nucleotide]
+                if amino and viewer.PAIR_CDS <= pair < viewer.PAIR_CDS2 + 4:
+                    char = amino[pos - chunk_start]
+                self.cells.append((nucleotide, pair, dim, char))
+                reader.advance()
+                pos += 1
+            self.flush(chunk_keep)
+        self.flush()
+        if self.html:
+            self.out.write(html_footer)
+
+#render a region of a chromosome (1-based, inclusive) to a stream
+def export(ch, start, end, out, html=False, width=80):
+    reader = viewer.Reader(ch, start)
+    end = min(end, reader.ch_size)
+    view = ExportView(reader, out, html, width)
+    view.export(start, end)
+
+#compare the nucleotides and pairs exported for a region with the viewer's decoded lines,
+#returning the positions that differ
+def check(ch, start, end):
+    reader = viewer.Reader(ch, start)
+    end = min(end, reader.ch_size)
+    view = ExportView(reader, io.StringIO())
+    view.written = []
+    view.export(start, end)
+    #lines as the viewer decodes them, without what export leaves out
+    viewer.display['variants'] = viewer.display['tracks'] = False
+    row_view = viewer.View(viewer.Reader(ch, start), None)
+    pos = row_view.Pos(row_view.top_pos.reader, start)
+    decoded = []
+    while pos.pos <= end:
+        row = row_view.decode_row(pos)
+        decoded += [cell[0:2] for cell in row.cells if cell is not None]
+    return [start + n for n in range(0, len(view.written)) if view.written[n] != decoded[n]]
+
+#get the region to export from the command line, as (chromosome, start, end)
+def get_region():
+    for arg in sys.argv[1:]:
+        match = re.fullmatch(r'([1-9XY]|1\d|2[0-2]|mt)\.(\d+)-(\d+)', arg)
+        if match:
+            return (match.group(1), int(match.group(2)), int(match.group(3)))
+        #regions in another assembly, such as hg19:7.1000-2000, are lifted over
+        prefixed = liftover.parse_prefixed(arg)
+        if prefixed and prefixed[3] is not None:
+            region = liftover.lift_region(*prefixed)
+            if region is None:
+                print("Region not lifted from {}: {}".format(prefixed[0], arg), file=sys.stderr)
+                sys.exit(1)
+            return region
+        match = re.fullmatch(r'gene=(\S+)', arg)
+        if match:
+            index = genes.GeneIndex.get_index()
+            record = index.find(match.group(1)) if index else None
+            if record is None:
+                print("Gene not found: " + match.group(1), file=sys.stderr)
+                sys.exit(1)
+            return record[1:4]
+    print("Usage: export.py [<assembly>:]<chromosome>.<start>-<end> | gene=<name> [html] [translate] [width=<n>] [out=<file>] [hl=<highlights>] [check]", file=sys.stderr)
+    sys.exit(1)
+
+def main():
+    viewer.parse_config()
+    viewer.parse_options()
+    ch, start, end = get_region()
+    html = False
+    width = 80
+    out_path = None
+    for arg in sys.argv[1:]:
+        if arg == "check":
+            positions = check(ch, start, end)
+            if positions:
+                print("Export differs from viewer at {} positions, first {}".format(len(positions), positions[0]))
+                sys.exit(1)
+            print("Export matches viewer")
+            return
+        if arg == "html":
+            html = True
+        if arg == "translate":
+            viewer.display['translate'] = True
+        match = re.fullmatch(r'width=(\d+)', arg)
+        if match:
+            width = int(match.group(1))
+        match = re.fullmatch(r'out=(.+)', arg)
+        if match:
+            out_path = match.group(1)
+    if out_path:
+        with open(out_path, 'w') as out:
+            export(ch, start, end, out, html, width)
+    else:
+        export(ch, start, end, sys.stdout, html, width)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/python3
+
+import os, sys, array, bisect, collections
+
+#GFF types kept by comment.py, by the code stored in data files (6 bits, 0-63)
+#the first 8 are the original ones, so older data files read the same
+feature_decode = {
+    0 : 'gap',
+    1 : 'exon',
+    2 : 'CDS',
+    3 : 'pseudogene',
+    4 : 'gene',
+    5 : 'tRNA',
+    6 : 'rRNA',
+    7 : 'miRNA',
+    8 : 'mRNA',
+    9 : 'transcript',
+    10 : 'primary_transcript',
+    11 : 'lnc_RNA',
+    12 : 'antisense_RNA',
+    13 : 'snRNA',
+    14 : 'snoRNA',
+    15 : 'scRNA',
+    16 : 'Y_RNA',
+    17 : 'vault_RNA',
+    18 : 'RNase_MRP_RNA',
+    19 : 'RNase_P_RNA',
+    20 : 'telomerase_RNA',
+    21 : 'ncRNA',
+    22 : 'C_gene_segment',
+    23 : 'D_gene_segment',
+    24 : 'J_gene_segment',
+    25 : 'V_gene_segment',
+    26 : 'D_loop',
+    27 : 'enhancer',
+    28 : 'promoter',
+    29 : 'silencer',
+    30 : 'insulator',
+    31 : 'TATA_box',
+    32 : 'CAAT_signal',
+    33 : 'GC_rich_promoter_region',
+    34 : 'transcriptional_cis_regulatory_region',
+    35 : 'locus_control_region',
+    36 : 'enhancer_blocking_element',
+    37 : 'protein_binding_site',
+    38 : 'DNaseI_hypersensitive_site',
+    39 : 'response_element',
+    40 : 'epigenetically_modified_region',
+    41 : 'imprinting_control_region',
+    42 : 'matrix_attachment_site',
+    43 : 'repeat_region',
+    44 : 'tandem_repeat',
+    45 : 'microsatellite',
+    46 : 'minisatellite',
+    47 : 'dispersed_repeat',
+    48 : 'mobile_genetic_element',
+    49 : 'direct_repeat',
+    50 : 'repeat_instability_region',
+    51 : 'conserved_region',
+    52 : 'origin_of_replication',
+    53 : 'replication_regulatory_region',
+    54 : 'replication_start_site',
+    55 : 'meiotic_recombination_region',
+    56 : 'mitotic_recombination_region',
+    57 : 'non_allelic_homologous_recombination_region',
+    58 : 'recombination_feature',
+    59 : 'chromosome_breakpoint',
+    60 : 'sequence_alteration',
+    61 : 'sequence_feature',
+    62 : 'nucleotide_motif',
+    63 : 'sequence_comparison'
+}
+
+feature_encode = {name : feat for feat, name in feature_decode.items()}
+
+strand_decode = {
+    1 : '+',
+    2 : '-',
+    3 : '.'
+}
+
+script_path = os.path.realpath(__file__)
+path = os.path.dirname(script_path)
+
+#compute the implicit interval tree over intervals sorted by start, given as tuples
+#of (start, end, ...): each node at level k >= 1 (index i with i & (2^k - 1) == 2^(k-1) - 1)
+#gets the maximum end position found in its subtree
+def get_max_ends(intervals):
+    n = len(intervals)
+    max_ends = [interval[1] for interval in intervals]
+    last_i = last = 0
+    for i in range(0, n, 2):
+        last_i = i
+        last = max_ends[i]
+    k = 1
+    while 1 << k <= n:
+        x = 1 << (k-1)
+        for i in range((x << 1) - 1, n, x << 2):
+            left = max_ends[i - x]
+            right = max_ends[i + x] if i + x < n else last
+            max_ends[i] = max(max_ends[i], left, right)
+        last_i = last_i - x if (last_i >> k) & 1 else last_i + x
+        if last_i < n and max_ends[last_i] > last:
+            last = max_ends[last_i]
+        k += 1
+    return max_ends
+
+#write a 32-bit unsigned array in little-endian order, as all indexes are
+def write_array(file, values):
+    if not isinstance(values, array.array) or values.typecode != 'I' or sys.byteorder == 'big':
+        values = array.array('I', values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    file.write(values.tobytes())
+
+#get a 32-bit unsigned little-endian column of an index (read or mapped), copied only on big-endian machines
+def get_array(data, offset, n):
+    column = memoryview(data)[offset:offset + 4*n].cast('I')
+    if sys.byteorder == 'big':
+        column = array.array('I', column)
+        column.byteswap()
+    return column
+
+#a feature, with 1-based inclusive coordinates as in GFF
+#info is the gene description for genes, the phase for CDS and None otherwise
+Feature = collections.namedtuple('Feature', ['ch', 'type', 'start', 'end', 'strand', 'info'])
+
+#per-chromosome feature index written by comment.py: features sorted by start,
+#laid out as an implicit interval tree whose nodes hold their subtree's max end
+class FeatureIndex:
+    ch_indexes = {}
+
+    @classmethod
+    def get_ch_index(cls, ch):
+        if ch not in cls.ch_indexes:
+            return cls(ch)
+        return cls.ch_indexes[ch]
+
+    def __init__(self, ch):
+        self.ch = ch
+        index_path = os.path.join(path, self.ch + ".fti")
+        with open(index_path, 'rb') as index_file:
+            data = index_file.read()
+        self.n = n = int.from_bytes(data[0:4], byteorder='little', signed=False)
+        self.starts = get_array(data, 4, n)
+        self.ends = get_array(data, 4 + 4*n, n)
+        self.max_ends = get_array(data, 4 + 8*n, n)
+        self.types = data[4 + 12*n:4 + 13*n]
+        self.strands = data[4 + 13*n:4 + 14*n]
+        self.info_offsets = get_array(data, 4 + 14*n, n)
+        self.info_block = data[4 + 18*n:]
+
+        #level of the root node
+        self.root_level = -1
+        while 1 << (self.root_level+1) <= n:
+            self.root_level += 1
+
+        FeatureIndex.ch_indexes[ch] = self
+
+    #get feature i as a Feature tuple
+    def get_feature(self, i):
+        feat = self.types[i]
+        info = None
+        offset = self.info_offsets[i]
+        if offset != 0xffffffff:
+            info = self.info_block[offset:self.info_block.find(b'\0', offset)].decode()
+            if feat == 2:
+                info = int(info)
+        return Feature(self.ch, feature_decode.get(feat, feat), self.starts[i], self.ends[i] - 1, strand_decode[self.strands[i]], info)
+
+    #get the first position after pos where a feature of a type starts, or None
+    #type 'gap end' gives the first position after a gap instead
+    def next_start(self, pos, type):
+        if type == 'gap end':
+            return self.next_gap_end(pos)
+        i = self.types.find(feature_encode[type], bisect.bisect_right(self.starts, pos))
+        return self.starts[i] if i >= 0 else None
+
+    #get the last position before pos where a feature of a type starts, or None
+    def prev_start(self, pos, type):
+        if type == 'gap end':
+            return self.prev_gap_end(pos)
+        i = self.types.rfind(feature_encode[type], 0, bisect.bisect_left(self.starts, pos))
+        return self.starts[i] if i >= 0 else None
+
+    #gaps don't overlap, so their ends are sorted like their starts
+    def next_gap_end(self, pos):
+        gap = feature_encode['gap']
+        i = bisect.bisect_right(self.starts, pos)
+        #pos may be inside the last gap starting before it
+        j = self.types.rfind(gap, 0, i)
+        if j < 0 or self.ends[j] <= pos:
+            j = self.types.find(gap, i)
+        return self.ends[j] if j >= 0 else None
+
+    def prev_gap_end(self, pos):
+        gap = feature_encode['gap']
+        j = self.types.rfind(gap, 0, bisect.bisect_left(self.starts, pos))
+        while j >= 0 and self.ends[j] >= pos:
+            j = self.types.rfind(gap, 0, j)
+        return self.ends[j] if j >= 0 else None
+
+    #get indices of the features overlapping [start, end), in order of start
+    def iter_overlapping_indices(self, start, end):
+        n = self.n
+        if n == 0:
+            return
+        starts = self.starts
+        ends = self.ends
+        max_ends = self.max_ends
+        #(level, node, left child visited)
+        stack = [(self.root_level, (1 << self.root_level) - 1, False)]
+        while stack:
+            k, x, visited = stack.pop()
+            if k <= 3:
+                #small subtree, scan it linearly
+                i = x >> k << k
+                i1 = min(i + (1 << (k+1)) - 1, n)
+                while i < i1 and starts[i] < end:
+                    if start < ends[i]:
+                        yield i
+                    i += 1
+            elif not visited:
+                stack.append((k, x, True))
+                y = x - (1 << (k-1))
+                if y >= n or max_ends[y] > start:
+                    stack.append((k-1, y, False))
+            elif x < n and starts[x] < end:
+                if start < ends[x]:
+                    yield x
+                stack.append((k-1, x + (1 << (k-1)), False))
+
+    #stream features overlapping positions start to end (inclusive)
+    #types, if given, is a collection of feature type names to keep
+    def iter_overlaps(self, start, end, types=None):
+        for i in self.iter_overlapping_indices(start, end + 1):
+            if types is None or feature_decode.get(self.types[i]) in types:
+                yield self.get_feature(i)
+
+    #get a list of features overlapping positions start to end (inclusive)
+    def overlaps(self, start, end, types=None):
+        return list(self.iter_overlaps(start, end, types))
+
+#stream features in a chromosome overlapping positions start to end (inclusive)
+def iter_query(ch, start, end, types=None):
+    return FeatureIndex.get_ch_index(ch).iter_overlaps(start, end, types)
+
+#get a list of features in a chromosome overlapping positions start to end (inclusive)
+def query(ch, start, end, types=None):
+    return FeatureIndex.get_ch_index(ch).overlaps(start, end, types)
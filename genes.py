@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+
+import os, mmap
+
+strand_decode = {
+    1 : '+',
+    2 : '-',
+    3 : '.'
+}
+
+script_path = os.path.realpath(__file__)
+path = os.path.dirname(script_path)
+
+#sorted gene name index written by comment.py, searched in place
+class GeneIndex:
+    index = None
+
+    #get the gene index, opening it on first use; None if it doesn't exist
+    @classmethod
+    def get_index(cls):
+        if cls.index is None:
+            index_path = os.path.join(path, "genes.idx")
+            if not os.path.isfile(index_path):
+                return None
+            cls.index = cls(index_path)
+        return cls.index
+
+    def __init__(self, index_path):
+        self.file = open(index_path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = int.from_bytes(self.data[0:4], byteorder='little', signed=False)
+
+    #get the offset of record n
+    def get_offset(self, n):
+        return int.from_bytes(self.data[4 + 4*n:8 + 4*n], byteorder='little', signed=False)
+
+    #get the name of gene n, as compared when searching
+    def get_key(self, n):
+        offset = self.get_offset(n)
+        return self.data[offset:self.data.find(b'\0', offset)].decode().upper()
+
+    #get gene n as (name, chromosome, start, end, strand)
+    def get_record(self, n):
+        offset = self.get_offset(n)
+        name_end = self.data.find(b'\0', offset)
+        ch_end = self.data.find(b'\0', name_end + 1)
+        name = self.data[offset:name_end].decode()
+        ch = self.data[name_end + 1:ch_end].decode()
+        start = int.from_bytes(self.data[ch_end + 1:ch_end + 5], byteorder='little', signed=False)
+        end = int.from_bytes(self.data[ch_end + 5:ch_end + 9], byteorder='little', signed=False)
+        strand = strand_decode[self.data[ch_end + 9]]
+        return (name, ch, start, end, strand)
+
+    #get index of the first gene whose name is not lower than key
+    def bisect(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    #find a gene by name (case-insensitive), returns its first location or None
+    def lookup(self, name):
+        key = name.upper()
+        n = self.bisect(key)
+        if n < self.count and self.get_key(n) == key:
+            return self.get_record(n)
+        return None
+
+    #find genes whose names start with prefix (case-insensitive), in order
+    def lookup_prefix(self, prefix, limit=None):
+        key = prefix.upper()
+        records = []
+        n = self.bisect(key)
+        while n < self.count and (limit is None or len(records) < limit):
+            if not self.get_key(n).startswith(key):
+                break
+            records.append(self.get_record(n))
+            n += 1
+        return records
+
+    #find a gene by exact name, or else the first one starting with it
+    def find(self, name):
+        record = self.lookup(name)
+        if record is None:
+            records = self.lookup_prefix(name, 1)
+            if records:
+                record = records[0]
+        return record
+
+    def __del__(self):
+        self.data.close()
+        self.file.close()
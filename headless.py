@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+
+import collections
+import viewer
+
+#same value as curses.color_pair() gives, which can't be called without a terminal
+def color_pair(pair):
+    return pair << 8
+
+def beep():
+    pass
+
+#an in-memory curses window, enough to draw the viewer on
+class Screen:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        #keys returned by getch(), and lines returned by getstr()
+        self.keys = collections.deque()
+        self.lines = collections.deque()
+        self.erase()
+
+    def erase(self):
+        self.cells = [[(' ', 0)] * self.width for y in range(0, self.height)]
+
+    def clear(self):
+        self.erase()
+
+    #change size, as a terminal does before sending KEY_RESIZE
+    def resize(self, width, height):
+        self.width = width
+        self.height = height
+        self.erase()
+
+    def addch(self, y, x, char, attr=0):
+        if y < 0 or y >= self.height or x < 0 or x >= self.width:
+            raise viewer.curses.error("addch() returned ERR")
+        self.cells[y][x] = (char, attr)
+
+    def addstr(self, y, x, text, attr=0):
+        if y < 0 or y >= self.height or x < 0 or x >= self.width:
+            raise viewer.curses.error("addstr() returned ERR")
+        for char in text[0:self.width - x]:
+            self.cells[y][x] = (char, attr)
+            x += 1
+
+    #move lines up (or down, if n is negative), adding blank lines
+    def scroll(self, n=1):
+        blank = [[(' ', 0)] * self.width for y in range(0, min(abs(n), self.height))]
+        if n > 0:
+            self.cells = self.cells[n:] + blank
+        elif n < 0:
+            self.cells = blank + self.cells[:n]
+
+    def move(self, y, x):
+        self.cursor = (y, x)
+
+    def clrtoeol(self):
+        y, x = self.cursor
+        self.cells[y][x:] = [(' ', 0)] * (self.width - x)
+
+    def getmaxyx(self):
+        return (self.height, self.width)
+
+    def getch(self):
+        return self.keys.popleft() if self.keys else -1
+
+    def getstr(self, y, x, n):
+        return self.lines.popleft()[0:n].encode() if self.lines else b""
+
+    def refresh(self):
+        pass
+
+    def nodelay(self, flag):
+        pass
+
+    def idlok(self, flag):
+        pass
+
+    def scrollok(self, flag):
+        pass
+
+    def immedok(self, flag):
+        pass
+
+    #get the characters on screen, as one string per line
+    def get_text(self):
+        return ["".join(cell[0] for cell in line) for line in self.cells]
+
+    #get the characters and attributes on screen
+    def get_cells(self):
+        return [list(line) for line in self.cells]
+
+#draw through headless screens from now on
+def install():
+    viewer.color_pair = color_pair
+    viewer.beep = beep
+
+#make a view of a region on a new headless screen
+def make_view(ch, pos, width=80, height=25):
+    install()
+    viewer.scrw = width
+    viewer.scrh = height
+    reader = viewer.Reader(ch, pos)
+    screen = Screen(width, height)
+    view = viewer.View(reader, screen)
+    view.fill(x=0, y=0, h=height)
+    return (view, screen)
@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+
+import sys, re, time, json, collections
+
+#counters for the viewer's hot paths
+counters = {
+    'seeks' : 0,
+    'bytes read' : 0,
+    'update_features' : 0,
+    'update_features_backwards' : 0,
+    'cds phase rescans' : 0,
+    'curses calls' : 0
+}
+#duration (in seconds) of every call to these View methods, other than those made
+#by one of them (as scrolling fills in the new lines), so that each is one frame
+frame_times = {
+    'fill' : [],
+    'scroll_down' : [],
+    'scroll_up' : []
+}
+#duration of the last frames of any kind, for the overlay
+recent_frame_times = collections.deque(maxlen=1000)
+
+enabled = False
+overlay = False
+json_path = None
+#the viewer module instrumented, which is __main__ when run as a script
+viewer = None
+#timed calls in progress
+timed_depth = 0
+
+#a data file that counts seeks and bytes read
+class CountingFile:
+    def __init__(self, file):
+        self.file = file
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        counters['bytes read'] += len(data)
+        return data
+
+    def seek(self, *args):
+        counters['seeks'] += 1
+        return self.file.seek(*args)
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+#a curses window that counts calls to its methods
+class CountingScreen:
+    def __init__(self, window):
+        self.window = window
+
+    def __getattr__(self, name):
+        attr = getattr(self.window, name)
+        if not callable(attr):
+            return attr
+        def call(*args):
+            counters['curses calls'] += 1
+            return attr(*args)
+        return call
+
+#get the value below which a fraction p of values fall (nearest rank)
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(int(p * len(values)), len(values) - 1)]
+
+#show frame time percentiles on the top right of the screen
+def draw_overlay(view):
+    text = " frame p50 {:.2f} ms p99 {:.2f} ms ".format(percentile(recent_frame_times, 0.5)*1000, percentile(recent_frame_times, 0.99)*1000)
+    window = getattr(view.screen, 'window', view.screen)
+    try:
+        window.addstr(0, max(viewer.scrw - len(text) - 1, 0), text, viewer.curses.A_REVERSE)
+    except viewer.curses.error:
+        pass
+
+#wrap a View method to record how long each call takes
+def timed(name, method):
+    times = frame_times[name]
+    def wrapper(self, *args, **kwargs):
+        global timed_depth
+        if timed_depth:
+            return method(self, *args, **kwargs)
+        timed_depth += 1
+        start = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        finally:
+            timed_depth -= 1
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        recent_frame_times.append(elapsed)
+        if overlay and self.screen is not None:
+            draw_overlay(self)
+        return result
+    return wrapper
+
+#wrap a method to count its calls
+def counted(name, method):
+    def wrapper(self, *args):
+        counters[name] += 1
+        return method(self, *args)
+    return wrapper
+
+#wrap Reader.get_cds_phase to count calls that miss its cache
+def counted_cds_phase(method):
+    def wrapper(self):
+        if self.mt_file.tell() != self.cds_phase_cache['saved_fpos']:
+            counters['cds phase rescans'] += 1
+        return method(self)
+    return wrapper
+
+#wrap View.__init__ to count calls to its screen
+def counted_screen(method):
+    def wrapper(self, reader, stdscr):
+        method(self, reader, stdscr)
+        if stdscr is not None:
+            self.screen = CountingScreen(stdscr)
+    return wrapper
+
+#instrument the viewer module given; nothing is recorded (and nothing slowed down)
+#until this is called
+def install(viewer_module):
+    global enabled, viewer
+    if enabled:
+        return
+    enabled = True
+    viewer = viewer_module
+    viewer.open_data = lambda file_path, open_data=viewer.open_data: CountingFile(open_data(file_path))
+    viewer.Reader.update_features = counted('update_features', viewer.Reader.update_features)
+    viewer.Reader.update_features_backwards = counted('update_features_backwards', viewer.Reader.update_features_backwards)
+    viewer.Reader.get_cds_phase = counted_cds_phase(viewer.Reader.get_cds_phase)
+    viewer.View.__init__ = counted_screen(viewer.View.__init__)
+    for name in frame_times.keys():
+        setattr(viewer.View, name, timed(name, getattr(viewer.View, name)))
+
+#get frame time statistics (in ms) and counters
+def get_summary():
+    frames = {}
+    for name, times in frame_times.items():
+        frames[name] = {
+            'count' : len(times),
+            'total' : sum(times)*1000,
+            'p50' : percentile(times, 0.5)*1000,
+            'p99' : percentile(times, 0.99)*1000,
+            'max' : max(times)*1000 if times else 0
+        }
+    return {'frames' : frames, 'counters' : dict(counters), 'reader pool' : dict(viewer.Reader.pool_stats), 'row cache' : dict(viewer.View.row_cache_stats)}
+
+#print the summary and write it to the JSON file, if any
+def report():
+    summary = get_summary()
+    for name, frame in summary['frames'].items():
+        print("{}: {} calls, p50 {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms".format(name, frame['count'], frame['p50'], frame['p99'], frame['max']))
+    for name, count in summary['counters'].items():
+        print("{}: {}".format(name, count))
+    print("reader pool: {} hits, {} misses, {} evictions".format(summary['reader pool']['hits'], summary['reader pool']['misses'], summary['reader pool']['evictions']))
+    print("row cache: {} hits, {} misses".format(summary['row cache']['hits'], summary['row cache']['misses']))
+    if json_path:
+        with open(json_path, 'w') as json_file:
+            json.dump(summary, json_file, indent=1)
+
+def parse_options():
+    global overlay, json_path
+    for arg in sys.argv[1:]:
+        if arg == "stats-overlay":
+            overlay = True
+        match = re.fullmatch(r'stats-json=(.+)', arg)
+        if match:
+            json_path = match.group(1)
@@ -0,0 +1,263 @@
+#!/usr/bin/python3
+
+import os, sys, re, mmap, array, bisect, collections, multiprocessing
+import sequence, features
+
+#NumPy makes counting much faster, but isn't needed
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+nucleotide_encode = {
+    'A' : 0,
+    'C' : 1,
+    'G' : 2,
+    'T' : 3
+}
+
+#k-mers are 2 bits per base in a 32-bit integer
+max_k = 16
+#up to this k, every possible k-mer gets a count; above it, only those found are stored
+dense_max_k = 12
+#bases counted at once, to bound memory
+chunk_size = 1 << 24
+
+script_path = os.path.realpath(__file__)
+path = os.path.dirname(script_path)
+
+conf = {
+    'k' : 8,
+    'processes' : os.cpu_count() or 1,
+    'chromosomes' : sequence.chromosomes
+}
+
+#get the path of the spectrum of k-mers of a length
+def get_spectrum_path(k):
+    return os.path.join(path, "kmers{}.spc".format(k))
+
+#get the parts of a chromosome outside gaps as (start, end), inclusive, at least k and no
+#more than chunk_size bases long, each overlapping the last by overlap bases (by default
+#k-1, so that no k-mer is lost)
+def iter_chunks(seq, k, overlap=None):
+    if overlap is None:
+        overlap = k-1
+    start = 1
+    for gap_start, gap_end in zip(seq.gap_starts + [seq.ch_size + 1], seq.gap_ends + [seq.ch_size + 1]):
+        end = min(gap_start - 1, seq.ch_size)
+        while end - start + 1 >= k:
+            chunk_end = min(start + chunk_size - 1, end)
+            yield (start, chunk_end)
+            if chunk_end == end:
+                break
+            start = chunk_end - overlap + 1
+        start = max(start, gap_end)
+
+#unpack the 2-bit codes of positions start to end (inclusive) straight from the mapped file
+def numpy_codes(seq, start, end):
+    first_byte = 4 + (start-1)//4
+    last_byte = 4 + (end-1)//4
+    packed = numpy.frombuffer(seq.data, dtype=numpy.uint8, count=last_byte - first_byte + 1, offset=first_byte)
+    codes = numpy.empty(4*len(packed), dtype=numpy.uint8)
+    for n in range(0, 4):
+        codes[n::4] = (packed >> (6 - 2*n)) & 3
+    offset = (start-1) % 4
+    return codes[offset:offset + end - start + 1]
+
+#get the k-mer starting at every position of a run of codes, as integers
+def numpy_kmers(codes, k):
+    n = len(codes) - k + 1
+    kmers = numpy.zeros(n, dtype=numpy.uint32)
+    for j in range(0, k):
+        kmers <<= 2
+        kmers |= codes[j:j + n]
+    return kmers
+
+#add up sparse spectra, given as (sorted k-mers, counts)
+def numpy_merge(parts):
+    kmers = numpy.concatenate([part[0] for part in parts])
+    counts = numpy.concatenate([part[1] for part in parts])
+    order = numpy.argsort(kmers, kind='stable')
+    kmers = kmers[order]
+    counts = counts[order]
+    starts = numpy.flatnonzero(numpy.concatenate(([True], kmers[1:] != kmers[:-1])))
+    return (kmers[starts], numpy.add.reduceat(counts, starts))
+
+def numpy_count(seq, k):
+    if k <= dense_max_k:
+        counts = numpy.zeros(4**k, dtype=numpy.uint64)
+        for start, end in iter_chunks(seq, k):
+            counts += numpy.bincount(numpy_kmers(numpy_codes(seq, start, end), k), minlength=4**k).astype(numpy.uint64)
+        return counts
+    parts = []
+    for start, end in iter_chunks(seq, k):
+        kmers, counts = numpy.unique(numpy_kmers(numpy_codes(seq, start, end), k), return_counts=True)
+        parts.append((kmers, counts.astype(numpy.uint64)))
+        if len(parts) >= 8:
+            parts = [numpy_merge(parts)]
+    if not parts:
+        return (numpy.zeros(0, dtype=numpy.uint32), numpy.zeros(0, dtype=numpy.uint64))
+    return numpy_merge(parts)
+
+#same, a base at a time, without NumPy
+def python_count(seq, k):
+    mask = (1 << 2*k) - 1
+    if k <= dense_max_k:
+        counts = array.array('Q', bytes(8 * 4**k))
+    else:
+        counts = collections.Counter()
+    for start, end in iter_chunks(seq, k):
+        codes = seq.get_codes(start, end)
+        kmer = 0
+        for code in codes[0:k-1]:
+            kmer = (kmer << 2) | code
+        for code in codes[k-1:]:
+            kmer = ((kmer << 2) | code) & mask
+            counts[kmer] += 1
+    if k <= dense_max_k:
+        return counts
+    kmers = sorted(counts.keys())
+    return (array.array('I', kmers), array.array('Q', [counts[kmer] for kmer in kmers]))
+
+#count the k-mers of a chromosome (run in a worker process)
+def count_chromosome(args):
+    ch, data_path, settings = args
+    sequence.path = data_path
+    seq = sequence.Sequence.get_ch_sequence(ch)
+    return numpy_count(seq, settings['k']) if numpy else python_count(seq, settings['k'])
+
+#get the chromosomes of settings that have a .bin file, raising FileNotFoundError if none do
+def get_chromosomes(settings):
+    chromosomes = [ch for ch in settings['chromosomes'] if os.path.isfile(os.path.join(sequence.path, ch + ".bin"))]
+    if not chromosomes:
+        raise FileNotFoundError("no chromosome files in " + sequence.path)
+    return chromosomes
+
+#run a function over chromosomes, one worker process per chromosome (up to settings['processes']
+#at once), giving each (chromosome, data path, settings); returns the results in order
+def map_chromosomes(function, chromosomes, settings):
+    with multiprocessing.Pool(min(settings['processes'], len(chromosomes))) as pool:
+        return pool.map(function, [(ch, sequence.path, settings) for ch in chromosomes])
+
+#parse the options of the scripts run with map_chromosomes(), processes= and chromosomes=,
+#into settings; returns the data path given with dir=, or None
+def parse_chromosome_options(settings):
+    data_path = None
+    for arg in sys.argv[1:]:
+        match = re.fullmatch(r'processes=(\d+)', arg)
+        if match:
+            settings['processes'] = int(match.group(1))
+        match = re.fullmatch(r'chromosomes=([\dXYmt,]+)', arg)
+        if match:
+            settings['chromosomes'] = match.group(1).split(',')
+        match = re.fullmatch(r'dir=(.+)', arg)
+        if match:
+            data_path = os.path.realpath(match.group(1))
+    return data_path
+
+#add up the spectra of all chromosomes
+def merge(results, k):
+    if k <= dense_max_k:
+        total = results[0]
+        for counts in results[1:]:
+            if numpy:
+                total += counts
+            else:
+                total = array.array('Q', map(sum, zip(total, counts)))
+        return total
+    if numpy:
+        return numpy_merge(results)
+    total = collections.Counter()
+    for kmers, counts in results:
+        total.update(dict(zip(kmers, counts)))
+    kmers = sorted(total.keys())
+    return (array.array('I', kmers), array.array('Q', [total[kmer] for kmer in kmers]))
+
+#spectrum: k, whether it's sparse and number of counts, then 32-bit counts of every
+#k-mer (dense) or sorted k-mers and their counts (sparse)
+def write_spectrum(spectrum, k, spectrum_path):
+    with open(spectrum_path, 'wb') as spectrum_file:
+        sparse = k > dense_max_k
+        counts = spectrum[1] if sparse else spectrum
+        spectrum_file.write(k.to_bytes(4, byteorder='little', signed=False))
+        spectrum_file.write(int(sparse).to_bytes(4, byteorder='little', signed=False))
+        spectrum_file.write(len(counts).to_bytes(8, byteorder='little', signed=False))
+        if numpy:
+            if sparse:
+                spectrum_file.write(spectrum[0].astype('<u4').tobytes())
+            spectrum_file.write(numpy.minimum(counts, 0xffffffff).astype('<u4').tobytes())
+            return
+        if sparse:
+            features.write_array(spectrum_file, spectrum[0])
+        features.write_array(spectrum_file, [min(count, 0xffffffff) for count in counts])
+
+#count the k-mers of the chromosomes in conf, one worker process per chromosome
+def count_all(k):
+    return merge(map_chromosomes(count_chromosome, get_chromosomes(conf), dict(conf, k=k)), k)
+
+#a k-mer spectrum written by this script, mapped rather than read
+class Spectrum:
+    spectra = {}
+
+    #get the spectrum of k-mers of a length, opening it on first use
+    @classmethod
+    def get_spectrum(cls, k):
+        if k not in cls.spectra:
+            cls.spectra[k] = cls(get_spectrum_path(k))
+        return cls.spectra[k]
+
+    def __init__(self, spectrum_path):
+        self.file = open(spectrum_path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.k = int.from_bytes(self.data[0:4], byteorder='little', signed=False)
+        self.sparse = int.from_bytes(self.data[4:8], byteorder='little', signed=False) != 0
+        self.n = n = int.from_bytes(self.data[8:16], byteorder='little', signed=False)
+        if self.sparse:
+            self.kmers = features.get_array(self.data, 16, n)
+            self.counts = features.get_array(self.data, 16 + 4*n, n)
+        else:
+            self.counts = features.get_array(self.data, 16, n)
+
+    #get how many times a k-mer (as a string) is found, in the (+) strand
+    def count(self, kmer):
+        value = 0
+        for base in kmer.upper():
+            if base not in nucleotide_encode:
+                return 0
+            value = (value << 2) | nucleotide_encode[base]
+        if not self.sparse:
+            return self.counts[value]
+        i = bisect.bisect_left(self.kmers, value)
+        return self.counts[i] if i < self.n and self.kmers[i] == value else 0
+
+#get how many times a k-mer is found in the genome, from its spectrum
+def count(kmer):
+    return Spectrum.get_spectrum(len(kmer)).count(kmer)
+
+def parse_options():
+    global path
+    data_path = parse_chromosome_options(conf)
+    if data_path:
+        path = sequence.path = data_path
+    for arg in sys.argv[1:]:
+        match = re.fullmatch(r'k=(\d+)', arg)
+        if match:
+            conf['k'] = int(match.group(1))
+
+if __name__ == '__main__':
+    parse_options()
+    k = conf['k']
+    if k < 1 or k > max_k:
+        print("k must be from 1 to {}".format(max_k), file=sys.stderr)
+        sys.exit(1)
+    if not numpy:
+        print("NumPy not found, counting will be slow")
+    spectrum = count_all(k)
+    spectrum_path = get_spectrum_path(k)
+    write_spectrum(spectrum, k, spectrum_path)
+    counts = spectrum[1] if k > dense_max_k else spectrum
+    if numpy:
+        total, distinct = int(counts.sum()), int(numpy.count_nonzero(counts))
+    else:
+        total, distinct = sum(counts), sum(1 for count in counts if count)
+    print("{} {}-mers ({} distinct) written to {}".format(total, k, distinct, spectrum_path))
@@ -0,0 +1,279 @@
+#!/usr/bin/python3
+
+import os, sys, re, mmap, gzip, bisect, itertools
+import sequence, features
+
+#NumPy makes lifting many positions at once much faster, but isn't needed
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+strand_encode = {
+    '+' : 1,
+    '-' : 2
+}
+
+strand_decode = {code : strand for strand, code in strand_encode.items()}
+
+#other names of assemblies, as used in prefixes such as hg19:7.140453136
+assembly_aliases = {
+    'grch37' : 'hg19',
+    'grch38' : 'hg38'
+}
+
+#positions read at once when lifting a file, to bound memory
+batch_size = 1 << 20
+
+script_path = os.path.realpath(__file__)
+path = os.path.dirname(script_path)
+
+#get the name used here for an assembly (lowercase, without aliases)
+def get_assembly(name):
+    return assembly_aliases.get(name.lower(), name.lower())
+
+#get the directory holding the indexes to lift from an assembly
+def get_liftover_path(assembly):
+    return os.path.join(path, "liftover", get_assembly(assembly))
+
+#split an assembly prefix off a position or region, as (assembly, rest), or (None, text) if there is none
+def split_assembly(text):
+    match = re.fullmatch(r'([A-Za-z]\w*):(.+)', text)
+    if not match:
+        return (None, text)
+    return (get_assembly(match.group(1)), match.group(2))
+
+#parse a position such as hg19:7.140453136, or a region such as hg19:7.140453000-140454000,
+#as (assembly, chromosome, start, end), with end None for a position; None if text isn't one
+def parse_prefixed(text):
+    assembly, rest = split_assembly(text)
+    if assembly is None:
+        return None
+    match = re.fullmatch(r'([1-9XY]|1\d|2[0-2]|mt)\.(\d+)(-(\d+))?', rest)
+    if not match:
+        return None
+    return (assembly, match.group(1), int(match.group(2)), int(match.group(4)) if match.group(4) else None)
+
+#get the aligned blocks of a chain file (optionally gzipped) as (source chromosome, source start,
+#length, target chromosome, target position of the first base, strand, score), 1-based
+#chains are from the assembly lifted from (UCSC's target) to the one lifted to (query)
+def read_chains(chain_path):
+    opener = gzip.open if chain_path.endswith('.gz') else open
+    with opener(chain_path, 'rt') as chain_file:
+        source_ch = target_ch = None
+        for line in chain_file:
+            fields = line.split()
+            if not fields or fields[0][0] == '#':
+                continue
+            if fields[0] == 'chain':
+                score = int(fields[1])
+                #only chains along the (+) strand of the source, as in UCSC files
+                source_ch = sequence.get_ch(fields[2]) if fields[4] == '+' else None
+                target_ch = sequence.get_ch(fields[7])
+                target_size = int(fields[8])
+                target_strand = fields[9]
+                source = int(fields[5])
+                target = int(fields[10])
+                continue
+            length = int(fields[0])
+            if source_ch and target_ch:
+                #(-) strand positions count from the end of the target chromosome
+                first = target + 1 if target_strand == '+' else target_size - target
+                yield (source_ch, source + 1, length, target_ch, first, strand_encode[target_strand], score)
+            if len(fields) == 3:
+                source += length + int(fields[1])
+                target += length + int(fields[2])
+
+#sort the blocks of a chromosome by start, cutting off the parts of each already
+#covered by one before it (or by a better chain starting at the same place)
+def clip_blocks(blocks):
+    blocks.sort(key=lambda block: (block[0], -block[5]))
+    clipped = []
+    covered = 0
+    for start, length, target_ch, first, strand, score in blocks:
+        skip = max(covered - start, 0)
+        if skip >= length:
+            continue
+        clipped.append((start + skip, length - skip, target_ch, first + skip if strand == strand_encode['+'] else first - skip, strand))
+        covered = start + length
+    return clipped
+
+#liftover index: count, then columns (starts, lengths, target positions of the first
+#base, target chromosomes as indexes in sequence.chromosomes, strands)
+def write_liftover_index(liftover_path, ch, blocks):
+    blocks = clip_blocks(blocks)
+    with open(os.path.join(liftover_path, ch + ".lft"), 'wb') as index_file:
+        index_file.write(len(blocks).to_bytes(4, byteorder='little', signed=False))
+        features.write_array(index_file, [block[0] for block in blocks])
+        features.write_array(index_file, [block[1] for block in blocks])
+        features.write_array(index_file, [block[3] for block in blocks])
+        index_file.write(bytes([sequence.chromosomes.index(block[2]) for block in blocks]))
+        index_file.write(bytes([block[4] for block in blocks]))
+    return len(blocks)
+
+#compile a chain file into indexes to lift from an assembly, replacing any others for it
+def convert(chain_path, assembly):
+    ch_blocks = {}
+    for block in read_chains(chain_path):
+        if block[0] not in ch_blocks:
+            ch_blocks[block[0]] = []
+        ch_blocks[block[0]].append(block[1:])
+    liftover_path = get_liftover_path(assembly)
+    os.makedirs(liftover_path, exist_ok=True)
+    for file_name in os.listdir(liftover_path):
+        os.remove(os.path.join(liftover_path, file_name))
+    LiftoverIndex.ch_indexes.pop(get_assembly(assembly), None)
+    return sum(write_liftover_index(liftover_path, ch, blocks) for ch, blocks in ch_blocks.items())
+
+#per-chromosome liftover index written by convert(), mapped rather than read
+class LiftoverIndex:
+    #indexes by assembly and chromosome, or None where nothing lifts
+    ch_indexes = {}
+
+    #get the index to lift a chromosome from an assembly, opening it on first use
+    @classmethod
+    def get_ch_index(cls, assembly, ch):
+        indexes = cls.ch_indexes.setdefault(get_assembly(assembly), {})
+        if ch not in indexes:
+            index_path = os.path.join(get_liftover_path(assembly), ch + ".lft")
+            indexes[ch] = cls(index_path) if os.path.isfile(index_path) else None
+        return indexes[ch]
+
+    def __init__(self, index_path):
+        self.file = open(index_path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.n = n = int.from_bytes(self.data[0:4], byteorder='little', signed=False)
+        self.starts = features.get_array(self.data, 4, n)
+        self.lengths = features.get_array(self.data, 4 + 4*n, n)
+        self.firsts = features.get_array(self.data, 4 + 8*n, n)
+        self.target_chs_offset = 4 + 12*n
+        self.strands_offset = 4 + 13*n
+
+    #get where a position lifts to as (chromosome, position, strand), or None if it doesn't
+    def lift(self, pos):
+        i = bisect.bisect_right(self.starts, pos) - 1
+        if i < 0 or pos >= self.starts[i] + self.lengths[i]:
+            return None
+        ch = sequence.chromosomes[self.data[self.target_chs_offset + i]]
+        strand = self.data[self.strands_offset + i]
+        offset = pos - self.starts[i]
+        return (ch, self.firsts[i] + offset if strand == strand_encode['+'] else self.firsts[i] - offset, strand_decode[strand])
+
+    #lift an array of positions at once, giving arrays of target chromosome indexes (-1 if
+    #a position doesn't lift), positions and strands
+    def numpy_lift(self, positions):
+        n = self.n
+        if n == 0:
+            return (numpy.full(len(positions), -1), positions, numpy.zeros(len(positions), dtype=numpy.uint8))
+        starts = numpy.frombuffer(self.data, dtype='<u4', count=n, offset=4).astype(numpy.int64)
+        lengths = numpy.frombuffer(self.data, dtype='<u4', count=n, offset=4 + 4*n).astype(numpy.int64)
+        firsts = numpy.frombuffer(self.data, dtype='<u4', count=n, offset=4 + 8*n).astype(numpy.int64)
+        target_chs = numpy.frombuffer(self.data, dtype=numpy.uint8, count=n, offset=self.target_chs_offset)
+        strands = numpy.frombuffer(self.data, dtype=numpy.uint8, count=n, offset=self.strands_offset)
+        i = numpy.searchsorted(starts, positions, side='right') - 1
+        found = i >= 0
+        i = numpy.maximum(i, 0)
+        offsets = positions - starts[i]
+        found &= offsets < lengths[i]
+        minus = strands[i] == strand_encode['-']
+        lifted = numpy.where(minus, firsts[i] - offsets, firsts[i] + offsets)
+        return (numpy.where(found, target_chs[i].astype(numpy.int64), -1), lifted, strands[i])
+
+#get where a position in an assembly lifts to as (chromosome, position, strand), or None
+def lift(assembly, ch, pos):
+    index = LiftoverIndex.get_ch_index(assembly, ch)
+    return index.lift(pos) if index else None
+
+#lift a region (both ends included) as (chromosome, start, end), or None if its ends
+#don't lift to the same chromosome
+def lift_region(assembly, ch, start, end):
+    first = lift(assembly, ch, start)
+    last = lift(assembly, ch, end)
+    if first is None or last is None or first[0] != last[0]:
+        return None
+    return (first[0], min(first[1], last[1]), max(first[1], last[1]))
+
+#get (chromosome, position) from a line such as "7 140453136", "chr7<tab>140453136" or "chr7:140453136"
+def parse_position(line):
+    fields = re.split(r'[\s:]+', line.strip())
+    if len(fields) < 2 or not fields[1].isdigit():
+        return None
+    ch = sequence.get_ch(fields[0])
+    return (ch, int(fields[1])) if ch else None
+
+#lift a batch of (chromosome, position), as a list of (chromosome, position, strand) or None
+def lift_batch(assembly, positions):
+    lifted = [None] * len(positions)
+    ch_items = {}
+    for n, (ch, pos) in enumerate(positions):
+        if ch not in ch_items:
+            ch_items[ch] = []
+        ch_items[ch].append(n)
+    for ch, items in ch_items.items():
+        index = LiftoverIndex.get_ch_index(assembly, ch)
+        if index is None:
+            continue
+        if not numpy:
+            for n in items:
+                lifted[n] = index.lift(positions[n][1])
+            continue
+        target_chs, targets, strands = index.numpy_lift(numpy.array([positions[n][1] for n in items], dtype=numpy.int64))
+        for n, target_ch, target, strand in zip(items, target_chs.tolist(), targets.tolist(), strands.tolist()):
+            if target_ch >= 0:
+                lifted[n] = (sequence.chromosomes[target_ch], target, strand_decode[strand])
+    return lifted
+
+#lift the positions in a file, one per line, writing each followed by where it lifts to
+#(or by dots); other lines are copied as they are
+def lift_file(assembly, in_file, out_file):
+    counts = [0, 0]
+    while True:
+        lines = list(itertools.islice(in_file, batch_size))
+        if not lines:
+            break
+        parsed = [parse_position(line) for line in lines]
+        lifted = iter(lift_batch(assembly, [position for position in parsed if position]))
+        for line, position in zip(lines, parsed):
+            if position is None:
+                out_file.write(line)
+                continue
+            target = next(lifted)
+            counts[target is None] += 1
+            out_file.write("{}\t{}\t{}\n".format(position[0], position[1], "\t".join(map(str, target)) if target else ".\t.\t."))
+    return counts
+
+def parse_options():
+    global path
+    options = {}
+    for arg in sys.argv[1:]:
+        match = re.fullmatch(r'(name|from|out)=(.+)', arg)
+        if match:
+            options[match.group(1)] = match.group(2)
+        match = re.fullmatch(r'dir=(.+)', arg)
+        if match:
+            path = os.path.realpath(match.group(1))
+    return options
+
+if __name__ == '__main__':
+    options = parse_options()
+    files = [arg for arg in sys.argv[1:] if '=' not in arg]
+    if len(files) != 1 or not os.path.isfile(files[0]):
+        print("Usage: liftover.py <file.chain>[.gz] [name=<assembly>] [dir=<path>]", file=sys.stderr)
+        print("       liftover.py <positions file> from=<assembly> [out=<file>] [dir=<path>]", file=sys.stderr)
+        sys.exit(1)
+    if 'from' in options:
+        out_file = open(options['out'], 'w') if 'out' in options else sys.stdout
+        with open(files[0]) as in_file:
+            lifted, unmapped = lift_file(options['from'], in_file, out_file)
+        if out_file is not sys.stdout:
+            out_file.close()
+        print("{} positions lifted, {} not".format(lifted, unmapped), file=sys.stderr)
+        sys.exit(0)
+    #chain files are named as hg19ToHg38.over.chain, after the assembly lifted from
+    match = re.match(r'([A-Za-z]\w*?)To[A-Z]', os.path.basename(files[0]))
+    assembly = options.get('name') or (match.group(1) if match else None)
+    if assembly is None:
+        print("Can't tell the assembly from the file name; give it with name=<assembly>", file=sys.stderr)
+        sys.exit(1)
+    count = convert(files[0], assembly)
+    print("{} blocks indexed to lift from {}".format(count, get_assembly(assembly)))
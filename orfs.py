@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+
+import os, sys, re
+import sequence, features, tracks, kmers
+
+#codes of each base multiplied by 16 and 4, to build codons without a loop
+times16_table = bytes(16*n for n in range(4)) + bytes(252)
+times4_table = bytes(4*n for n in range(4)) + bytes(252)
+
+#start (M) and stop (*) codons of a genetic code, indexed by packed codon, '-' for others
+def get_codon_class_table(codon_table):
+    return bytes(codon if codon in b"M*" else ord('-') for codon in codon_table) + bytes(192)
+
+codon_class_table = get_codon_class_table(sequence.codon_table)
+mt_codon_class_table = get_codon_class_table(sequence.mt_codon_table)
+
+#overlap between the chunks read at once (see kmers.iter_chunks()); ORFs longer than
+#it could lose their start
+chunk_overlap = 1 << 20
+
+conf = {
+    'length' : 300,
+    'processes' : os.cpu_count() or 1,
+    'chromosomes' : sequence.chromosomes,
+    'name' : "orfs"
+}
+
+#get the class (start, stop or other) of every codon in a reading frame of 2-bit codes
+def get_codon_classes(codes, frame, table):
+    n = (len(codes) - frame) // 3
+    first = codes[frame:frame + 3*n:3].translate(times16_table)
+    second = codes[frame + 1:frame + 3*n:3].translate(times4_table)
+    third = codes[frame + 2:frame + 3*n:3]
+    #no sum is over 63, so adding them as big numbers adds each byte separately
+    codons = (int.from_bytes(first, 'big') + int.from_bytes(second, 'big') + int.from_bytes(third, 'big')).to_bytes(n, 'big')
+    return codons.translate(table)
+
+#find ORFs in the six frames of positions start to end, as (strand, start, end) with
+#inclusive positions, from the start codon to the stop codon
+def find_in_chunk(seq, start, end, pattern, table):
+    orfs = []
+    for strand in ('+', '-'):
+        codes = seq.get_codes(start, end, reverse=(strand == '-'))
+        for frame in range(0, 3):
+            for match in pattern.finditer(get_codon_classes(codes, frame, table)):
+                first = frame + 3*match.start()
+                last = frame + 3*match.end() - 1
+                if strand == '+':
+                    orfs.append((strand, start + first, start + last))
+                else:
+                    orfs.append((strand, end - last, end - first))
+    return orfs
+
+#check whether an annotated CDS in the same strand and frame overlaps an ORF
+def is_annotated(ch, strand, start, end):
+    try:
+        cds_list = features.query(ch, start, end, types=['CDS'])
+    except FileNotFoundError:
+        return False
+    for cds in cds_list:
+        phase = cds.info or 0
+        if cds.strand != strand:
+            continue
+        if strand == '+' and (cds.start + phase - start) % 3 == 0:
+            return True
+        if strand == '-' and (cds.end - phase - end) % 3 == 0:
+            return True
+    return False
+
+#find the ORFs of a chromosome and write them as its part of the tracks (run in a worker process)
+def find_orfs(args):
+    ch, data_path, settings = args
+    sequence.path = features.path = tracks.path = data_path
+    conf.update(settings)
+    seq = sequence.Sequence.get_ch_sequence(ch)
+    codons = (conf['length'] + 2) // 3
+    pattern = re.compile(rb"M[^*]{%d,}\*" % max(codons - 2, 0))
+    table = mt_codon_class_table if ch == 'mt' else codon_class_table
+    #ORFs found again in the overlap of two chunks end at the same stop codon
+    by_stop = {}
+    for start, end in kmers.iter_chunks(seq, 1, chunk_overlap):
+        for strand, orf_start, orf_end in find_in_chunk(seq, start, end, pattern, table):
+            stop = (strand, orf_end if strand == '+' else orf_start)
+            if stop not in by_stop or orf_end - orf_start > by_stop[stop][2] - by_stop[stop][1]:
+                by_stop[stop] = (strand, orf_start, orf_end)
+    intervals = []
+    unannotated = []
+    for strand, start, end in by_stop.values():
+        name = "{} {} aa".format(strand, (end - start + 1)//3 - 1)
+        if is_annotated(ch, strand, start, end):
+            intervals.append((start, end + 1, name))
+        else:
+            intervals.append((start, end + 1, name + " unannotated"))
+            unannotated.append(intervals[-1])
+    if intervals:
+        tracks.write_track_index(tracks.get_track_path(conf['name']), ch, intervals)
+    if unannotated:
+        tracks.write_track_index(tracks.get_track_path("unannotated-" + conf['name']), ch, unannotated)
+    return (len(intervals), len(unannotated))
+
+#find the ORFs of the chromosomes in conf, one worker process per chromosome
+def find_all():
+    chromosomes = kmers.get_chromosomes(conf)
+    for name in (conf['name'], "unannotated-" + conf['name']):
+        tracks.clear_track(name)
+    counts = kmers.map_chromosomes(find_orfs, chromosomes, conf)
+    return (sum(count[0] for count in counts), sum(count[1] for count in counts))
+
+def parse_options():
+    data_path = kmers.parse_chromosome_options(conf)
+    if data_path:
+        sequence.path = features.path = tracks.path = data_path
+    for arg in sys.argv[1:]:
+        match = re.fullmatch(r'length=(\d+)', arg)
+        if match:
+            conf['length'] = int(match.group(1))
+        match = re.fullmatch(r'name=([\w-]+)', arg)
+        if match:
+            conf['name'] = match.group(1)
+
+if __name__ == '__main__':
+    parse_options()
+    count, unannotated = find_all()
+    print("{} ORFs in track {}, {} of them not annotated as CDS (in track unannotated-{})".format(count, conf['name'], unannotated, conf['name']))
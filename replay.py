@@ -0,0 +1,237 @@
+#!/usr/bin/python3
+
+import os, sys, re, time, json, hashlib
+import viewer, headless
+
+curses = viewer.curses
+
+#steps that press a key (a number of times)
+step_keys = {
+    'down' : curses.KEY_DOWN,
+    'up' : curses.KEY_UP,
+    'pagedown' : curses.KEY_NPAGE,
+    'pageup' : curses.KEY_PPAGE,
+    'pause' : ord(' '),
+    'faster' : ord('+'),
+    'slower' : ord('-'),
+    'strand' : ord('s'),
+    'translate' : ord('t'),
+    'variants' : ord('v'),
+    'tracks' : ord('u'),
+    'next' : ord(']'),
+    'previous' : ord('[')
+}
+#steps that can be repeated, and recorded as one line with a count
+repeated_steps = ['down', 'up']
+
+#write the keys pressed in the viewer as a replay script
+class Recorder:
+    def __init__(self, record_path, view):
+        self.file = open(record_path, 'w')
+        self.view = view
+        #last step and how many times in a row it happened
+        self.last = None
+        self.count = 0
+        H, W = view.screen.getmaxyx()
+        self.file.write("start {} {} {} {}\n".format(view.top_pos.reader.ch, view.top_pos.pos, W, H))
+
+    def flush(self):
+        if self.last:
+            self.file.write(self.last if self.count == 1 else "{} {}".format(self.last, self.count))
+            self.file.write("\n")
+        self.last = None
+        self.count = 0
+
+    def add(self, step, n=1):
+        if step == self.last and step in repeated_steps:
+            self.count += n
+            return
+        self.flush()
+        self.last = step
+        self.count = n
+
+    #the view scrolled down by itself a number of lines in a frame, recorded as one step
+    #however many they are
+    def tick(self, lines):
+        self.add("tick {}".format(lines))
+
+    #a key was pressed and acted on (n times, for keys that scroll)
+    def key(self, key, n=1):
+        if key == curses.KEY_RESIZE:
+            H, W = self.view.screen.getmaxyx()
+            self.add("resize {} {}".format(W, H))
+        elif key in (ord('g'), ord('j'), ord('p'), ord('['), ord(']')):
+            #replay where the prompt led to, rather than what was typed in it
+            self.add("goto {} {}".format(self.view.top_pos.reader.ch, self.view.top_pos.pos))
+        elif key == ord('f'):
+            self.add("feature " + self.view.feature_type)
+        elif key == ord('\n') or key == curses.KEY_ENTER:
+            self.add('pause')
+        else:
+            for step, step_key in step_keys.items():
+                if key == step_key:
+                    self.add(step, n)
+                    return
+            self.add("key {}".format(key))
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+#read a replay script as (line number, step, arguments)
+def parse_script(lines):
+    steps = []
+    number = 0
+    for line in lines:
+        number += 1
+        words = line.split('#')[0].split()
+        if not words:
+            continue
+        step, args = words[0], words[1:]
+        if step not in step_keys and step not in ('start', 'tick', 'resize', 'goto', 'gene', 'feature', 'key'):
+            raise ValueError("line {}: unknown step '{}'".format(number, step))
+        steps.append((number, step, args))
+    return steps
+
+#act out a step once on a view and its headless screen
+def apply_step(view, screen, step, args):
+    if step == 'tick':
+        view.scroll(int(args[0]) if args else 1)
+    elif step in step_keys:
+        viewer.handle_key(view, step_keys[step])
+    elif step == 'resize':
+        screen.resize(int(args[0]), int(args[1]))
+        viewer.handle_key(view, curses.KEY_RESIZE)
+    elif step == 'goto':
+        view.goto(args[0], int(args[1]))
+    elif step == 'gene':
+        import genes
+        record = genes.GeneIndex.get_index().find(args[0])
+        if record:
+            view.goto(record[1], record[2])
+    elif step == 'feature':
+        view.feature_type = " ".join(args)
+    elif step == 'key':
+        viewer.handle_key(view, int(args[0]))
+
+#get a short hash of everything on a screen
+def get_screen_hash(screen):
+    return hashlib.sha1(repr(screen.cells).encode()).hexdigest()[0:16]
+
+#replay steps on a new view, timing each one (and each repetition) and hashing the screen after it
+def run(steps, ch, pos, width, height):
+    saved_display = dict(viewer.display)
+    saved_paused = viewer.paused
+    viewer.Reader.clear()
+    viewer.View.row_cache.clear()
+    start = time.perf_counter()
+    view, screen = headless.make_view(ch, pos, width, height)
+    trace = [{'line' : 0, 'step' : 'start', 'seconds' : time.perf_counter() - start, 'hash' : get_screen_hash(screen)}]
+    for number, step, args in steps:
+        if step == 'start':
+            continue
+        count = int(args[0]) if step in step_keys and args else 1
+        for n in range(0, count):
+            start = time.perf_counter()
+            apply_step(view, screen, step, args)
+            elapsed = time.perf_counter() - start
+            trace.append({'line' : number, 'step' : step if count > 1 else " ".join([step] + args), 'seconds' : elapsed, 'hash' : get_screen_hash(screen)})
+    viewer.display.update(saved_display)
+    viewer.paused = saved_paused
+    return trace
+
+#get the lines of steps whose screens differ between two traces
+def compare_traces(trace, other):
+    if len(trace) != len(other):
+        return [-1]
+    return sorted(set(step['line'] for step, other_step in zip(trace, other) if step['hash'] != other_step['hash']))
+
+def print_latencies(trace):
+    times = {}
+    for step in trace:
+        times.setdefault(step['step'].split()[0], []).append(step['seconds'])
+    for step, step_times in times.items():
+        step_times.sort()
+        print("{}: {} steps, p50 {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms".format(step, len(step_times),
+            step_times[len(step_times) // 2]*1000, step_times[min(int(len(step_times)*0.99), len(step_times) - 1)]*1000, step_times[-1]*1000))
+    print("Slowest steps:")
+    for step in sorted(trace, key=lambda step: -step['seconds'])[0:5]:
+        print("  line {}: {} ({:.2f} ms)".format(step['line'], step['step'], step['seconds']*1000))
+
+#use data files from another directory
+def set_data_path(data_path):
+    import sequence, genes, features, variants, tracks, liftover
+    viewer.path = sequence.path = genes.path = features.path = variants.path = tracks.path = liftover.path = data_path
+
+def main():
+    if len(sys.argv) < 2 or not os.path.isfile(sys.argv[1]):
+        print("Usage: replay.py <script> [runs=<n>] [out=<trace>] [check=<trace>] [dir=<data>]", file=sys.stderr)
+        sys.exit(1)
+    viewer.parse_config()
+    viewer.parse_options()
+    runs = 2
+    out_path = None
+    check_path = None
+    for arg in sys.argv[2:]:
+        match = re.fullmatch(r'runs=(\d+)', arg)
+        if match:
+            runs = max(int(match.group(1)), 1)
+        match = re.fullmatch(r'out=(.+)', arg)
+        if match:
+            out_path = match.group(1)
+        match = re.fullmatch(r'check=(.+)', arg)
+        if match:
+            check_path = match.group(1)
+        match = re.fullmatch(r'dir=(.+)', arg)
+        if match:
+            set_data_path(os.path.realpath(match.group(1)))
+    with open(sys.argv[1]) as script_file:
+        try:
+            steps = parse_script(script_file)
+        except ValueError as e:
+            print("{}: {}".format(sys.argv[1], e), file=sys.stderr)
+            sys.exit(1)
+    ch, pos, width, height = viewer.ch_initial, viewer.pos_initial, 80, 25
+    for number, step, args in steps:
+        if step == 'start':
+            ch, pos = args[0], int(args[1])
+            if len(args) >= 4:
+                width, height = int(args[2]), int(args[3])
+
+    traces = [run(steps, ch, pos, width, height) for n in range(0, runs)]
+    print_latencies(traces[-1])
+    deterministic = True
+    for trace in traces[1:]:
+        lines = compare_traces(traces[0], trace)
+        if lines:
+            deterministic = False
+            print("Screens differ between runs after lines: " + ", ".join(str(line) for line in lines))
+    #lines taken from the row cache must look as if decoded again
+    rows = viewer.reader_pool['rows']
+    viewer.reader_pool['rows'] = 0
+    lines = compare_traces(traces[0], run(steps, ch, pos, width, height))
+    viewer.reader_pool['rows'] = rows
+    if lines:
+        deterministic = False
+        print("Screens differ without the row cache after lines: " + ", ".join(str(line) for line in lines))
+    if check_path:
+        with open(check_path) as check_file:
+            lines = compare_traces(json.load(check_file)['trace'], traces[0])
+        if lines:
+            deterministic = False
+            print("Screens differ from {} after lines: {}".format(check_path, ", ".join(str(line) for line in lines)))
+    if deterministic:
+        print("Screens match in all {} runs, and without the row cache".format(runs))
+    if deterministic and check_path:
+        print("Screens match " + check_path)
+    if out_path:
+        with open(out_path, 'w') as out_file:
+            json.dump({'script' : sys.argv[1], 'trace' : traces[0]}, out_file, indent=1)
+    if viewer.profiling:
+        import instrument
+        instrument.report()
+    if not deterministic:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
 #!/usr/bin/python3
 
-import os, sys, shutil, configparser
+import time
+launch_time = time.perf_counter()
+import os, sys
 
 GRCh_revision = "38"
 chromosomes = ('1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12', '13', '14', '15', '16', '17', '18', '19', '20', '21', '22', 'X', 'Y', 'mt')
@@ -13,11 +15,46 @@ conf = {
 
 script_path = os.path.realpath(__file__)
 path = os.path.dirname(script_path)
+#interpreters found by get_python_paths(), kept between runs
+state_path = os.path.join(path, "rsource.state")
 
 python3_path = None
 pypy3_path = None
+
+#read interpreter paths saved by a previous run, if they still exist
+def load_python_paths():
+    global python3_path, pypy3_path
+    try:
+        state_file = open(state_path, 'r')
+    except FileNotFoundError:
+        return False
+    state = {}
+    for line in state_file:
+        key, _, value = line.rstrip('\n').partition('=')
+        state[key] = value
+    state_file.close()
+    if state.get('python3') and state.get('pypy3'):
+        if os.path.isfile(state['python3'].strip('"')) and os.path.isfile(state['pypy3'].strip('"')):
+            python3_path = state['python3']
+            pypy3_path = state['pypy3']
+            print("Python 3: " + python3_path)
+            print("PyPy3: " + pypy3_path)
+            return True
+    return False
+
+def save_python_paths():
+    if not python3_path or not pypy3_path:
+        return
+    state_file = open(state_path, 'w')
+    state_file.write("python3=" + python3_path + "\n")
+    state_file.write("pypy3=" + pypy3_path + "\n")
+    state_file.close()
+
 def get_python_paths():
     global python3_path, pypy3_path
+    import shutil
+    if load_python_paths():
+        return
     python3_path = sys.executable
     python3_path = shutil.which("python3")
     if not python3_path:
@@ -48,6 +85,7 @@ def get_python_paths():
         python3_path = "\"" + python3_path + "\""
     if pypy3_path:
         pypy3_path = "\"" + pypy3_path + "\""
+    save_python_paths()
 
 def get_sequence(sequence_gz_path):
     sequence_url = "ftp://ftp.ncbi.nlm.nih.gov/refseq/H_sapiens/annotation/GRCh" + GRCh_revision + "_latest/refseq_identifiers/GRCh" + GRCh_revision + "_latest_genomic.fna.gz"
@@ -119,6 +157,7 @@ def get_config(section, config):
     conf[config] = section.getboolean(config, conf[config])
 
 def parse_config():
+    import configparser
     config = configparser.ConfigParser()
     config_path = os.path.join(path, "config.ini")
     config.read(config_path)
@@ -128,26 +167,28 @@ def parse_config():
         get_config(section, 'delete annotations')
         get_config(section, 'delete gaps')
 
-get_python_paths()
-parse_config()
-chromosomes_exist = check_exist(".bin")
-if not chromosomes_exist:
-    print("No chromosomes present")
-    make_chromosomes()
-metadata_exist = check_exist(".dat")
-gaps_exist = check_exist(".gap")
-if not metadata_exist:
-    print("No metadata present")
-    if not gaps_exist:
-        print("No gap annotations found; generating from sequence...")
-        make_chromosomes()
-    make_metadata()
+#run the viewer in this same interpreter
+def view():
+    sys.path.insert(0, path)
+    import viewer
+    viewer.launch_time = launch_time
+    viewer.run()
 
+chromosomes_exist = check_exist(".bin")
+metadata_exist = chromosomes_exist and check_exist(".dat")
 if chromosomes_exist and metadata_exist:
-    viewer_script_path = os.path.join(path, "viewer.py")
-    args = " ".join(sys.argv[1:])
-    command = python3_path + " \"" + viewer_script_path + "\" " + args
-    print("Command: " + command)
-    os.system(command)
+    view()
 else:
+    get_python_paths()
+    parse_config()
+    if not chromosomes_exist:
+        print("No chromosomes present")
+        make_chromosomes()
+    metadata_exist = check_exist(".dat")
+    if not metadata_exist:
+        print("No metadata present")
+        if not check_exist(".gap"):
+            print("No gap annotations found; generating from sequence...")
+            make_chromosomes()
+        make_metadata()
     print("Exiting. Run again to view.")
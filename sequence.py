@@ -0,0 +1,233 @@
+#!/usr/bin/python3
+
+import os, sys, re, mmap, array, bisect
+
+chromosomes = [
+    '1', '2', '3', '4', '5', '6', '7', '8', '9', '10',
+    '11', '12', '13', '14', '15', '16', '17', '18', '19',
+    '20', '21', '22', 'X', 'Y', 'mt'
+]
+
+#get the name used here for a chromosome as named in other files (1, chr1, NC_000001.11, chrM...), or None
+def get_ch(name):
+    match = re.fullmatch(r'NC_0*(\d+)(\.\d+)?', name)
+    if match:
+        number = int(match.group(1))
+        return {23 : 'X', 24 : 'Y', 12920 : 'mt'}.get(number, str(number))
+    if name.lower().startswith('chr'):
+        name = name[3:]
+    if name.upper() in ('M', 'MT'):
+        return 'mt'
+    if name.upper() in ('X', 'Y'):
+        return name.upper()
+    if re.fullmatch(r'[1-9]|1\d|2[0-2]', name):
+        return name
+    return None
+
+#translation tables from a packed byte to each of its 4 nucleotides
+decode_tables = [bytes(b"ACGT"[(b >> (6 - 2*n)) & 3] for b in range(256)) for n in range(4)]
+#same, but to their 2-bit codes (A=0, C=1, G=2, T=3)
+code_tables = [bytes((b >> (6 - 2*n)) & 3 for b in range(256)) for n in range(4)]
+complement_table = bytes.maketrans(b"ACGTN", b"TGCAN")
+#reverse complement of the 4 nucleotides in a packed byte: a bitwise NOT, then slots reversed
+packed_reverse_table = bytes(
+    ((~b & 3) << 6) | ((~b >> 2 & 3) << 4) | ((~b >> 4 & 3) << 2) | (~b >> 6 & 3)
+    for b in range(256)
+)
+
+#amino acid of each codon, indexed by its 6 packed bits (standard genetic code)
+codon_table = b"KNKNTTTTRSRSIIMIQHQHPPPPRRRRLLLLEDEDAAAAGGGGVVVV*Y*YSSSS*CWCLFLF"
+#same, for the vertebrate mitochondrial genetic code
+mt_codon_table = b"KNKNTTTT*S*SMIMIQHQHPPPPRRRRLLLLEDEDAAAAGGGGVVVV*Y*YSSSSWCWCLFLF"
+#6 packed bits of the reverse complement of each codon
+reverse_codons = [((~i & 3) << 4) | ((~i >> 2 & 3) << 2) | (~i >> 4 & 3) for i in range(64)]
+
+#requests closer than this (in bp) are read together by fetch_many()
+coalesce_distance = 16384
+#but never into blocks longer than this
+coalesce_max_length = 1 << 20
+
+script_path = os.path.realpath(__file__)
+path = os.path.dirname(script_path)
+
+#random access to a packed chromosome (.bin) through mmap
+class Sequence:
+    ch_sequences = {}
+
+    @classmethod
+    def get_ch_sequence(cls, ch):
+        if ch not in cls.ch_sequences:
+            return cls(ch)
+        return cls.ch_sequences[ch]
+
+    def __init__(self, ch):
+        self.ch = ch
+        ch_path = os.path.join(path, self.ch + ".bin")
+        self.file = open(ch_path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.ch_size = int.from_bytes(self.data[0:4], byteorder='little', signed=False)
+        self.load_gaps()
+        Sequence.ch_sequences[ch] = self
+
+    #load gap intervals [start, end) from the gap file, or the feature index if deleted
+    def load_gaps(self):
+        self.gap_starts = []
+        self.gap_ends = []
+        gap_path = os.path.join(path, self.ch + ".gap")
+        if os.path.isfile(gap_path):
+            bounds = array.array('I')
+            with open(gap_path, 'rb') as gap_file:
+                data = gap_file.read()
+            bounds.frombytes(data[:len(data) - len(data) % 8])
+            if sys.byteorder == 'big':
+                bounds.byteswap()
+            for n in range(0, len(bounds), 2):
+                if bounds[n+1] != 0:
+                    self.gap_starts.append(bounds[n])
+                    self.gap_ends.append(bounds[n+1])
+        else:
+            import features
+            for gap in features.iter_query(self.ch, 1, self.ch_size, types=['gap']):
+                self.gap_starts.append(gap.start)
+                self.gap_ends.append(gap.end + 1)
+
+    #unpack positions start to end (1-based, inclusive, within the chromosome)
+    #through a set of translation tables, one per slot in a packed byte
+    def unpack(self, start, end, tables, reverse=False):
+        first_byte = 4 + (start-1)//4
+        last_byte = 4 + (end-1)//4
+        packed = self.data[first_byte:last_byte+1]
+        offset = (start-1) % 4
+        if reverse:
+            #reverse complement whole bytes before decoding
+            packed = packed.translate(packed_reverse_table)[::-1]
+            offset = 4*len(packed) - offset - (end - start + 1)
+        decoded = bytearray(4*len(packed))
+        for n in range(0, 4):
+            decoded[n::4] = packed.translate(tables[n])
+        return decoded[offset:offset + end - start + 1]
+
+    #get 2-bit nucleotide codes from start to end (1-based, inclusive) as bytes
+    #gaps are not marked, and read as A (0)
+    def get_codes(self, start, end, reverse=False):
+        start = max(start, 1)
+        end = min(end, self.ch_size)
+        if end < start:
+            return b""
+        return bytes(self.unpack(start, end, code_tables, reverse))
+
+    #get nucleotides from start to end (1-based, inclusive) as bytes, N in gaps
+    def fetch(self, start, end, reverse=False):
+        start = max(start, 1)
+        end = min(end, self.ch_size)
+        if end < start:
+            return b""
+        decoded = self.unpack(start, end, decode_tables, reverse)
+        index = bisect.bisect_right(self.gap_ends, start)
+        while index < len(self.gap_starts) and self.gap_starts[index] <= end:
+            gap_start = max(self.gap_starts[index], start) - start
+            gap_end = min(self.gap_ends[index], end + 1) - start
+            if reverse:
+                gap_start, gap_end = end - start + 1 - gap_end, end - start + 1 - gap_start
+            decoded[gap_start:gap_end] = b"N" * (gap_end - gap_start)
+            index += 1
+        return bytes(decoded)
+
+    #get the genetic code of this chromosome
+    def get_codon_table(self):
+        return mt_codon_table if self.ch == 'mt' else codon_table
+
+    #translate the codons from start to end (1-based, inclusive) into amino acids
+    #reverse translates the (-) strand, starting from end
+    def translate(self, start, end, reverse=False):
+        codes = self.get_codes(start, end, reverse)
+        table = self.get_codon_table()
+        return bytes(table[(codes[n] << 4) | (codes[n+1] << 2) | codes[n+2]] for n in range(0, len(codes) - 2, 3))
+
+    #get the amino acids coded by annotated CDS around positions start to end
+    #(1-based, inclusive), one byte per position: the amino acid of a codon is
+    #placed at its middle base, other positions are spaces
+    def translation_track(self, start, end):
+        import features
+        track = bytearray(b" " * (end - start + 1))
+        cds_list = features.query(self.ch, start - 1, end + 1, types=['CDS'])
+        if not cds_list:
+            return bytes(track)
+        first = max(start - 1, 1)
+        codes = self.get_codes(first, end + 1)
+        table = self.get_codon_table()
+        for cds in cds_list:
+            phase = cds.info or 0
+            #position of the middle base of the first codon
+            if cds.strand == '-':
+                origin = cds.end - phase - 1
+            else:
+                origin = cds.start + phase + 1
+            low = max(start, cds.start + 1)
+            high = min(end, cds.end - 1)
+            m = low + (origin - low) % 3
+            while m <= high:
+                if track[m - start] == 32:
+                    codon = (codes[m-1 - first] << 4) | (codes[m - first] << 2) | codes[m+1 - first]
+                    if cds.strand == '-':
+                        codon = reverse_codons[codon]
+                    track[m - start] = table[codon]
+                m += 3
+        return bytes(track)
+
+    def __del__(self):
+        self.data.close()
+        self.file.close()
+
+#get a region of a chromosome (1-based, inclusive) as a string, N in gaps
+#reverse gives the reverse complement, as_bytes returns bytes instead
+def fetch(ch, start, end, reverse=False, as_bytes=False):
+    sequence = Sequence.get_ch_sequence(ch).fetch(start, end, reverse)
+    return sequence if as_bytes else sequence.decode()
+
+#translate a coding region (1-based, inclusive) into a string of amino acids
+#reverse translates the (-) strand; the region should start (or end) on a codon
+def translate(ch, start, end, reverse=False):
+    return Sequence.get_ch_sequence(ch).translate(start, end, reverse).decode()
+
+#get the amino acids of annotated CDS in a region, as a string with one
+#character per position: amino acids at the middle base of codons, spaces elsewhere
+def translation_track(ch, start, end):
+    return Sequence.get_ch_sequence(ch).translation_track(start, end).decode()
+
+#get many regions, given as (ch, start, end) or (ch, start, end, strand)
+#they are read in chromosome and position order, with nearby regions read together
+#results are returned in the order given; an unknown chromosome raises ValueError before any is read
+def fetch_many(regions, as_bytes=False):
+    regions = list(regions)
+    for region in regions:
+        if region[0] not in chromosomes:
+            raise ValueError("Unknown chromosome: {}".format(region[0]))
+    order = sorted(range(0, len(regions)), key=lambda n: (chromosomes.index(regions[n][0]), regions[n][1]))
+    results = [None] * len(regions)
+    n = 0
+    while n < len(order):
+        #gather a block of nearby regions
+        ch, block_start, block_end = regions[order[n]][0:3]
+        m = n + 1
+        while m < len(order):
+            region = regions[order[m]]
+            if region[0] != ch or region[1] > block_end + coalesce_distance:
+                break
+            if max(block_end, region[2]) - block_start > coalesce_max_length:
+                break
+            block_end = max(block_end, region[2])
+            m += 1
+        sequence = Sequence.get_ch_sequence(ch)
+        block_start = max(block_start, 1)
+        block = sequence.fetch(block_start, block_end)
+        for k in order[n:m]:
+            region = regions[k]
+            start = max(region[1], 1)
+            end = min(region[2], sequence.ch_size)
+            result = block[start - block_start:end - block_start + 1] if end >= start else b""
+            if len(region) > 3 and region[3] == '-':
+                result = result.translate(complement_table)[::-1]
+            results[k] = result if as_bytes else result.decode()
+        n = m
+    return results
@@ -0,0 +1,278 @@
+#!/usr/bin/python3
+
+import os, sys, re, json, asyncio, collections, urllib.parse
+import sequence, features, genes, liftover
+
+host = "127.0.0.1"
+port = 8038
+socket_path = None
+
+#nucleotides sent per chunk of a sequence response
+chunk_size = 1 << 20
+#features sent per chunk of a feature response
+features_chunk_size = 1024
+#recently requested regions up to this size (in bp) are kept in memory
+cache_max_length = 1 << 16
+cache_entries = 1024
+
+region_cache = collections.OrderedDict()
+cache_stats = {
+    'hits' : 0,
+    'misses' : 0
+}
+
+status_reasons = {
+    200 : "OK",
+    400 : "Bad Request",
+    404 : "Not Found",
+    405 : "Method Not Allowed"
+}
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+#get a region, going through the cache for short ones
+def get_region(ch, start, end, reverse):
+    if end - start + 1 > cache_max_length:
+        return sequence.Sequence.get_ch_sequence(ch).fetch(start, end, reverse)
+    key = (ch, start, end, reverse)
+    if key in region_cache:
+        cache_stats['hits'] += 1
+        region_cache.move_to_end(key)
+        return region_cache[key]
+    cache_stats['misses'] += 1
+    region = sequence.Sequence.get_ch_sequence(ch).fetch(start, end, reverse)
+    region_cache[key] = region
+    if len(region_cache) > cache_entries:
+        region_cache.popitem(last=False)
+    return region
+
+#get a query parameter, converted with type
+def get_param(params, name, type=str, default=None):
+    if name not in params:
+        if default is None:
+            raise RequestError(400, "Missing parameter: " + name)
+        return default
+    try:
+        return type(params[name][-1])
+    except ValueError:
+        raise RequestError(400, "Invalid parameter: " + name)
+
+#get and check the chromosome, start and end of a request, lifting them over if the
+#chromosome comes from another assembly (as in ch=hg19:7)
+def get_region_params(params):
+    assembly, ch = liftover.split_assembly(get_param(params, 'ch'))
+    start = get_param(params, 'start', int)
+    end = get_param(params, 'end', int)
+    if assembly is None:
+        if ch not in sequence.chromosomes:
+            raise RequestError(404, "Unknown chromosome: " + ch)
+        return (ch, start, end)
+    region = liftover.lift_region(assembly, ch, start, end)
+    if region is None:
+        raise RequestError(404, "Region not lifted from {}: {}.{}-{}".format(assembly, ch, start, end))
+    return region
+
+async def send_headers(stream_out, status, content_type, length=None):
+    lines = ["HTTP/1.1 {} {}".format(status, status_reasons[status])]
+    lines.append("Content-Type: " + content_type)
+    if length is None:
+        lines.append("Transfer-Encoding: chunked")
+    else:
+        lines.append("Content-Length: {}".format(length))
+    stream_out.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+    await stream_out.drain()
+
+async def send_chunk(stream_out, data):
+    if data:
+        stream_out.write("{:x}\r\n".format(len(data)).encode() + data + b"\r\n")
+        await stream_out.drain()
+
+async def send_json(stream_out, status, value):
+    data = json.dumps(value).encode()
+    await send_headers(stream_out, status, "application/json", len(data))
+    stream_out.write(data)
+    await stream_out.drain()
+
+#once the headers are sent, an error can't be answered with another response,
+#so the connection is closed instead
+def abort_response(e):
+    if isinstance(e, ConnectionError):
+        raise e
+    raise ConnectionAbortedError(str(e)) from e
+
+#/sequence?ch=&start=&end=[&strand=-]: nucleotides as plain text, N in gaps
+async def serve_sequence(stream_out, params):
+    ch, start, end = get_region_params(params)
+    ch_sequence = sequence.Sequence.get_ch_sequence(ch)
+    start = max(start, 1)
+    end = min(end, ch_sequence.ch_size)
+    reverse = get_param(params, 'strand', str, '+') == '-'
+    length = max(end - start + 1, 0)
+    await send_headers(stream_out, 200, "text/plain", length)
+    try:
+        if length <= cache_max_length:
+            stream_out.write(get_region(ch, start, end, reverse))
+            await stream_out.drain()
+            return
+        #stream large regions, reading them from the end if reversed
+        if reverse:
+            chunk_end = end
+            while chunk_end >= start:
+                chunk_start = max(chunk_end - chunk_size + 1, start)
+                stream_out.write(ch_sequence.fetch(chunk_start, chunk_end, True))
+                await stream_out.drain()
+                chunk_end = chunk_start - 1
+        else:
+            chunk_start = start
+            while chunk_start <= end:
+                chunk_end = min(chunk_start + chunk_size - 1, end)
+                stream_out.write(ch_sequence.fetch(chunk_start, chunk_end))
+                await stream_out.drain()
+                chunk_start = chunk_end + 1
+    except Exception as e:
+        abort_response(e)
+
+#/features?ch=&start=&end=[&types=gene,CDS]: overlapping features as a JSON array
+async def serve_features(stream_out, params):
+    ch, start, end = get_region_params(params)
+    types = get_param(params, 'types', str, "")
+    types = types.split(',') if types else None
+    for type in types or []:
+        if type not in features.feature_encode:
+            raise RequestError(400, "Unknown feature type: " + type)
+    #opened before the headers, so that a missing index is still answered with an error
+    index = features.FeatureIndex.get_ch_index(ch)
+    await send_headers(stream_out, 200, "application/json")
+    try:
+        parts = ["["]
+        first = True
+        for feature in index.iter_overlaps(start, end, types):
+            if not first:
+                parts.append(",")
+            first = False
+            parts.append(json.dumps(feature._asdict()))
+            if len(parts) >= features_chunk_size:
+                await send_chunk(stream_out, "".join(parts).encode())
+                parts = []
+        parts.append("]")
+        await send_chunk(stream_out, "".join(parts).encode())
+        stream_out.write(b"0\r\n\r\n")
+        await stream_out.drain()
+    except Exception as e:
+        abort_response(e)
+
+#/gene?name=: a gene by name (or first starting with it)
+#/gene?prefix=[&limit=]: all genes starting with prefix
+async def serve_gene(stream_out, params):
+    index = genes.GeneIndex.get_index()
+    if index is None:
+        raise RequestError(404, "No gene index")
+    fields = ['name', 'ch', 'start', 'end', 'strand']
+    if 'prefix' in params:
+        limit = get_param(params, 'limit', int, 100)
+        records = index.lookup_prefix(get_param(params, 'prefix'), limit)
+        await send_json(stream_out, 200, [dict(zip(fields, record)) for record in records])
+        return
+    record = index.find(get_param(params, 'name'))
+    if record is None:
+        raise RequestError(404, "Gene not found")
+    await send_json(stream_out, 200, dict(zip(fields, record)))
+
+#/chromosomes: sizes of all available chromosomes
+async def serve_chromosomes(stream_out, params):
+    sizes = {}
+    for ch in sequence.chromosomes:
+        if os.path.isfile(os.path.join(sequence.path, ch + ".bin")):
+            sizes[ch] = sequence.Sequence.get_ch_sequence(ch).ch_size
+    await send_json(stream_out, 200, sizes)
+
+#/stats: region cache statistics
+async def serve_stats(stream_out, params):
+    await send_json(stream_out, 200, dict(cache_stats, entries=len(region_cache)))
+
+routes = {
+    '/sequence' : serve_sequence,
+    '/features' : serve_features,
+    '/gene' : serve_gene,
+    '/chromosomes' : serve_chromosomes,
+    '/stats' : serve_stats
+}
+
+#serve HTTP requests from a client until it disconnects
+async def handle_client(stream_in, stream_out):
+    try:
+        while True:
+            request_line = await stream_in.readline()
+            if not request_line:
+                break
+            headers = {}
+            line = await stream_in.readline()
+            while line not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+                line = await stream_in.readline()
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            try:
+                method, target, version = request_line.decode('latin-1').split()
+                if version == "HTTP/1.0":
+                    keep_alive = headers.get('connection', '').lower() == 'keep-alive'
+                if method != "GET":
+                    raise RequestError(405, "Only GET is supported")
+                url = urllib.parse.urlsplit(target)
+                if url.path not in routes:
+                    raise RequestError(404, "Unknown path: " + url.path)
+                await routes[url.path](stream_out, urllib.parse.parse_qs(url.query))
+            except RequestError as e:
+                await send_json(stream_out, e.status, {'error' : str(e)})
+            except ValueError:
+                await send_json(stream_out, 400, {'error' : "Malformed request"})
+                keep_alive = False
+            except FileNotFoundError as e:
+                await send_json(stream_out, 404, {'error' : "Missing data file: " + os.path.basename(e.filename or "")})
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        stream_out.close()
+
+async def serve():
+    if socket_path:
+        server = await asyncio.start_unix_server(handle_client, path=socket_path)
+        print("Serving on " + socket_path)
+    else:
+        server = await asyncio.start_server(handle_client, host, port)
+        print("Serving on http://{}:{}/".format(host, port))
+    sys.stdout.flush()
+    async with server:
+        await server.serve_forever()
+
+#use data files from another directory
+def set_data_path(data_path):
+    sequence.path = features.path = genes.path = liftover.path = data_path
+
+def parse_options():
+    global host, port, socket_path
+    for arg in sys.argv[1:]:
+        match = re.fullmatch(r'port=(\d+)', arg)
+        if match:
+            port = int(match.group(1))
+        match = re.fullmatch(r'host=(\S+)', arg)
+        if match:
+            host = match.group(1)
+        match = re.fullmatch(r'socket=(.+)', arg)
+        if match:
+            socket_path = match.group(1)
+        match = re.fullmatch(r'dir=(.+)', arg)
+        if match:
+            set_data_path(os.path.realpath(match.group(1)))
+
+if __name__ == '__main__':
+    parse_options()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
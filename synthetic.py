@@ -0,0 +1,193 @@
+#!/usr/bin/python3
+
+import sys, os, re, random
+
+#sequence IDs and FASTA descriptions, as found in the NCBI files
+def get_seqid(ch):
+    if ch == 'mt':
+        return "NC_012920.1"
+    number = {'X' : 23, 'Y' : 24}.get(ch) or int(ch)
+    return "NC_{:06d}.1".format(number)
+
+def get_description(ch):
+    if ch == 'mt':
+        return "Homo sapiens mitochondrion, complete genome"
+    return "Homo sapiens chromosome {}, GRCh38.p14 Primary Assembly".format(ch)
+
+mt_length = 16569
+line_length = 80
+
+#settings of the generated genome; all randomness comes from seed
+conf = {
+    'chromosomes' : ['1', '2', 'mt'],
+    'size' : 1000000,
+    'genes' : 20,
+    'gaps' : 4,
+    'telomere' : 10000,
+    'repeats' : 0.5,
+    'seed' : 1
+}
+
+#get the gaps [start, end] of a chromosome, including both ends
+def make_gaps(rng, ch, length):
+    telomere = min(conf['telomere'], length // 10) if ch != 'mt' else 0
+    gaps = []
+    if telomere:
+        gaps.append((1, telomere))
+    if ch == 'mt':
+        #the mitochondrial sequence has a single N, as in the real one
+        gaps.append((3107, 3107))
+    else:
+        for n in range(0, conf['gaps']):
+            start = rng.randint(telomere + 1, length - telomere - 1)
+            gaps.append((start, min(start + rng.randint(100, 50000), length - telomere - 1)))
+    if telomere:
+        gaps.append((length - telomere + 1, length))
+    merged = []
+    for start, end in sorted(gaps):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+#write a chromosome to a FASTA file, soft-masking random runs
+def write_sequence(rng, out, ch, length, gaps):
+    out.write(">{} {}\n".format(get_seqid(ch), get_description(ch)))
+    sequence = []
+    pos = 1
+    for start, end in gaps + [(length + 1, length)]:
+        while pos < start:
+            run = min(rng.randint(50, 2000), start - pos)
+            bases = "".join(rng.choices("ACGT", k=run))
+            if rng.random() < conf['repeats']:
+                bases = bases.lower()
+            sequence.append(bases)
+            pos += run
+        if start <= end:
+            sequence.append("N" * (end - start + 1))
+            pos = end + 1
+    sequence = "".join(sequence)
+    for n in range(0, length, line_length):
+        out.write(sequence[n:n + line_length])
+        out.write("\n")
+
+def gff_line(ch, feature, start, end, strand, phase, attributes):
+    return "\t".join([get_seqid(ch), "RefSeq", feature, str(start), str(end), ".", strand, phase, attributes]) + "\n"
+
+#write genes (with exons and CDS), pseudogenes and RNA genes to a GFF file
+def write_annotations(rng, out, ch, length):
+    genes = conf['genes'] * length // 1000000 if ch != 'mt' else 13
+    for n in range(0, genes):
+        name = "SYN{}G{}".format(ch.upper(), n + 1)
+        start = rng.randint(1, length - 1)
+        end = min(start + rng.randint(500, 100000), length)
+        strand = rng.choice("+-")
+        feature = "pseudogene" if rng.random() < 0.1 else "gene"
+        attributes = "ID=gene-{0};Dbxref=GeneID:{1};Name={0};description=synthetic gene {0};gbkey=Gene;gene={0}".format(name, n + 1)
+        out.write(gff_line(ch, feature, start, end, strand, ".", attributes))
+        rna = rng.random()
+        if rna < 0.05:
+            out.write(gff_line(ch, "tRNA", start, min(start + 72, end), strand, ".", "ID=rna-{0};Parent=gene-{0};gbkey=tRNA".format(name)))
+            continue
+        elif rna < 0.1:
+            out.write(gff_line(ch, "rRNA", start, end, strand, ".", "ID=rna-{0};Parent=gene-{0};gbkey=rRNA".format(name)))
+            continue
+        elif rna < 0.15:
+            out.write(gff_line(ch, "miRNA", start, min(start + 22, end), strand, ".", "ID=rna-{0};Parent=gene-{0};gbkey=ncRNA".format(name)))
+            continue
+        exon_start = start
+        phase = 0
+        while exon_start < end:
+            exon_end = min(exon_start + rng.randint(50, 400), end)
+            out.write(gff_line(ch, "exon", exon_start, exon_end, strand, ".", "ID=exon-{0};Parent=rna-{0};gbkey=mRNA".format(name)))
+            if feature == "gene":
+                cds_start = min(exon_start + 10, exon_end)
+                out.write(gff_line(ch, "CDS", cds_start, exon_end, strand, str(phase), "ID=cds-{0};Parent=rna-{0};gbkey=CDS".format(name)))
+                phase = (phase - (exon_end - cds_start + 1)) % 3
+            exon_start = exon_end + rng.randint(100, 5000)
+
+#get chain blocks as (length, gap in source, gap in target) aligning source positions from
+#source_start to target positions [start, end), with small insertions and deletions between them;
+#returns them and where the source ends
+def make_chain_blocks(rng, source_start, start, end):
+    blocks = []
+    source = source_start
+    while start < end:
+        length = min(rng.randint(1000, 20000), end - start)
+        source_gap, target_gap = rng.choice([(rng.randint(1, 300), 0), (0, rng.randint(1, 300)), (rng.randint(1, 300), rng.randint(1, 300))])
+        target_gap = min(target_gap, end - start - length)
+        blocks.append((length, source_gap, target_gap))
+        source += length + source_gap
+        start += length + target_gap
+    return (blocks, source - blocks[-1][1])
+
+def write_chain(out, chain_id, source_size, source_start, source_end, ch, target_size, strand, target_start, target_end, blocks):
+    name = "chrM" if ch == 'mt' else "chr" + ch
+    score = sum(block[0] for block in blocks)
+    out.write("chain {} {} {} + {} {} {} {} {} {} {} {}\n".format(score, name, source_size, source_start, source_end, name, target_size, strand, target_start, target_end, chain_id))
+    for length, source_gap, target_gap in blocks[:-1]:
+        out.write("{}\t{}\t{}\n".format(length, source_gap, target_gap))
+    out.write("{}\n\n".format(blocks[-1][0]))
+
+#write a chain file lifting an older made-up assembly to the generated one: the older one
+#has extra bases at the start, small insertions and deletions, and its middle fifth inverted
+def write_chains(rng, out, ch, length, chain_id):
+    a = length*2//5
+    b = length*3//5
+    shift = rng.randint(0, 5000)
+    #three chains: before the inversion, the inversion (in the (-) strand), after it
+    before, end_before = make_chain_blocks(rng, shift, 0, a)
+    inverted, end_inverted = make_chain_blocks(rng, end_before + 100, length - b, length - a)
+    after, end_after = make_chain_blocks(rng, end_inverted + 100, b, length)
+    source_size = end_after + rng.randint(0, 5000)
+    write_chain(out, chain_id, source_size, shift, end_before, ch, length, '+', 0, a, before)
+    write_chain(out, chain_id + 1, source_size, end_before + 100, end_inverted, ch, length, '-', length - b, length - a, inverted)
+    write_chain(out, chain_id + 2, source_size, end_inverted + 100, end_after, ch, length, '+', b, length, after)
+
+#write a synthetic genome as FASTA and GFF files, always the same for the same settings
+def generate(fasta_path, gff_path):
+    rng = random.Random(conf['seed'])
+    fasta_file = open(fasta_path, 'w')
+    gff_file = open(gff_path, 'w')
+    gff_file.write("##gff-version 3\n")
+    for ch in conf['chromosomes']:
+        length = mt_length if ch == 'mt' else conf['size']
+        gaps = make_gaps(rng, ch, length)
+        write_sequence(rng, fasta_file, ch, length, gaps)
+        write_annotations(rng, gff_file, ch, length)
+    fasta_file.close()
+    gff_file.close()
+
+#write a chain file for the same genome; chains come from a random generator of their own,
+#so that the genome doesn't change with or without them
+def generate_chains(chain_path):
+    rng = random.Random(conf['seed'])
+    with open(chain_path, 'w') as chain_file:
+        for n, ch in enumerate(conf['chromosomes']):
+            length = mt_length if ch == 'mt' else conf['size']
+            write_chains(rng, chain_file, ch, length, 3*n + 1)
+
+def parse_options():
+    for arg in sys.argv[1:]:
+        match = re.fullmatch(r'(size|genes|gaps|telomere|seed)=(\d+)', arg)
+        if match:
+            conf[match.group(1)] = int(match.group(2))
+        match = re.fullmatch(r'repeats=([\d.]+)', arg)
+        if match:
+            conf['repeats'] = float(match.group(1))
+        match = re.fullmatch(r'chromosomes=([\dXYmt,]+)', arg)
+        if match:
+            conf['chromosomes'] = match.group(1).split(',')
+
+if __name__ == '__main__':
+    parse_options()
+    out_path = "."
+    for arg in sys.argv[1:]:
+        match = re.fullmatch(r'dir=(.+)', arg)
+        if match:
+            out_path = match.group(1)
+    os.makedirs(out_path, exist_ok=True)
+    generate(os.path.join(out_path, "sequence.fna"), os.path.join(out_path, "annotations.gff"))
+    if "chain" in sys.argv[1:]:
+        generate_chains(os.path.join(out_path, "oldToHg38.over.chain"))
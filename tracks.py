@@ -0,0 +1,156 @@
+#!/usr/bin/python3
+
+import os, sys, re, mmap, gzip, collections
+import sequence, features
+
+script_path = os.path.realpath(__file__)
+path = os.path.dirname(script_path)
+
+#an interval of a track, with 1-based inclusive coordinates as in GFF
+Interval = collections.namedtuple('Interval', ['ch', 'start', 'end', 'name'])
+
+pattern_gff_name = re.compile(r'(?:^|;)Name=([^;]*)')
+
+#get the directory holding the indexes of a track
+def get_track_path(name):
+    return os.path.join(path, "tracks", name)
+
+#get the names of all converted tracks
+def get_track_names():
+    tracks_path = os.path.join(path, "tracks")
+    if not os.path.isdir(tracks_path):
+        return []
+    return sorted(os.listdir(tracks_path))
+
+#get (chromosome, start, end (exclusive), name) from a BED or GFF line, or None
+def parse_line(line, gff):
+    if line[0] == '#' or line.startswith('track') or line.startswith('browser'):
+        return None
+    fields = line.rstrip('\n').split('\t')
+    if len(fields) < 3:
+        return None
+    ch = sequence.get_ch(fields[0])
+    if ch is None:
+        return None
+    if gff:
+        if len(fields) < 9:
+            return None
+        match = pattern_gff_name.search(fields[8])
+        return (ch, int(fields[3]), int(fields[4]) + 1, match.group(1) if match else fields[2])
+    #BED starts count from 0 and exclude the end, so only the start moves
+    return (ch, int(fields[1]) + 1, int(fields[2]) + 1, fields[3] if len(fields) > 3 else "")
+
+#sort intervals by start and compute the implicit interval tree over them,
+#as comment.py does for features
+def index_intervals(intervals):
+    intervals.sort()
+    return features.get_max_ends(intervals)
+
+#track index: count, then columns (starts, ends, max ends, name offsets and the
+#end of the last name), then names
+def write_track_index(track_path, ch, intervals):
+    max_ends = index_intervals(intervals)
+    name_offsets = []
+    name_block = bytearray()
+    for interval in intervals:
+        name_offsets.append(len(name_block))
+        name_block += interval[2].encode()
+    name_offsets.append(len(name_block))
+    with open(os.path.join(track_path, ch + ".trk"), 'wb') as index_file:
+        index_file.write(len(intervals).to_bytes(4, byteorder='little', signed=False))
+        features.write_array(index_file, [interval[0] for interval in intervals])
+        features.write_array(index_file, [interval[1] for interval in intervals])
+        features.write_array(index_file, max_ends)
+        features.write_array(index_file, name_offsets)
+        index_file.write(name_block)
+
+#empty the directory of a track (creating it if needed) before writing it again, returning its path
+def clear_track(name):
+    track_path = get_track_path(name)
+    os.makedirs(track_path, exist_ok=True)
+    for file_name in os.listdir(track_path):
+        os.remove(os.path.join(track_path, file_name))
+    return track_path
+
+#convert a BED or GFF file (optionally gzipped) into a track, replacing any of the same name
+def convert(input_path, name):
+    gff = re.search(r'\.gff3?(\.gz)?$', input_path) is not None
+    ch_intervals = {}
+    opener = gzip.open if input_path.endswith('.gz') else open
+    with opener(input_path, 'rt') as input_file:
+        for line in input_file:
+            interval = parse_line(line, gff)
+            if interval is None:
+                continue
+            ch = interval[0]
+            if ch not in ch_intervals:
+                ch_intervals[ch] = []
+            ch_intervals[ch].append(interval[1:])
+    track_path = clear_track(name)
+    for ch, intervals in ch_intervals.items():
+        write_track_index(track_path, ch, intervals)
+    TrackIndex.ch_indexes.pop(name, None)
+    return sum(len(intervals) for intervals in ch_intervals.values())
+
+#per-chromosome index of a track written by convert(), mapped rather than read,
+#and searched as a feature index
+class TrackIndex(features.FeatureIndex):
+    #indexes by track and chromosome, or None where the track has no intervals
+    ch_indexes = {}
+
+    #get the index of a track in a chromosome, opening it on first use
+    @classmethod
+    def get_ch_index(cls, name, ch):
+        indexes = cls.ch_indexes.setdefault(name, {})
+        if ch not in indexes:
+            index_path = os.path.join(get_track_path(name), ch + ".trk")
+            indexes[ch] = cls(name, ch, index_path) if os.path.isfile(index_path) else None
+        return indexes[ch]
+
+    def __init__(self, name, ch, index_path):
+        self.name = name
+        self.ch = ch
+        self.file = open(index_path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.n = n = int.from_bytes(self.data[0:4], byteorder='little', signed=False)
+        self.starts = features.get_array(self.data, 4, n)
+        self.ends = features.get_array(self.data, 4 + 4*n, n)
+        self.max_ends = features.get_array(self.data, 4 + 8*n, n)
+        self.name_offsets = features.get_array(self.data, 4 + 12*n, n + 1)
+        self.name_block_offset = 8 + 16*n
+
+        #level of the root node
+        self.root_level = -1
+        while 1 << (self.root_level+1) <= n:
+            self.root_level += 1
+
+    #get interval i as an Interval tuple
+    def get_interval(self, i):
+        name = self.data[self.name_block_offset + self.name_offsets[i]:self.name_block_offset + self.name_offsets[i+1]].decode()
+        return Interval(self.ch, self.starts[i], self.ends[i] - 1, name)
+
+    #get (start, end) of the intervals overlapping [start, end), with end exclusive, for drawing
+    def get_ranges(self, start, end):
+        return [(self.starts[i], self.ends[i]) for i in self.iter_overlapping_indices(start, end)]
+
+#get a list of intervals of a track in a chromosome overlapping positions start to end (inclusive)
+def query(name, ch, start, end):
+    index = TrackIndex.get_ch_index(name, ch)
+    if index is None:
+        return []
+    return [index.get_interval(i) for i in index.iter_overlapping_indices(start, end + 1)]
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or not os.path.isfile(sys.argv[1]):
+        print("Usage: tracks.py <file.bed|file.gff3>[.gz] [name=<track>] [dir=<path>]", file=sys.stderr)
+        sys.exit(1)
+    name = re.sub(r'[^\w-]', '_', os.path.basename(sys.argv[1]).split('.')[0])
+    for arg in sys.argv[2:]:
+        match = re.fullmatch(r'name=([\w-]+)', arg)
+        if match:
+            name = match.group(1)
+        match = re.fullmatch(r'dir=(.+)', arg)
+        if match:
+            path = os.path.realpath(match.group(1))
+    count = convert(sys.argv[1], name)
+    print("{} intervals in track {}".format(count, name))
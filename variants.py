@@ -0,0 +1,191 @@
+#!/usr/bin/python3
+
+import os, sys, re, mmap, gzip, array, bisect, glob, collections
+import sequence, features
+
+nucleotide_encode = {
+    'A' : 0,
+    'C' : 1,
+    'G' : 2,
+    'T' : 3
+}
+
+kind_decode = {
+    0 : 'SNV',
+    1 : 'insertion',
+    2 : 'deletion',
+    3 : 'other'
+}
+
+kind_encode = {name : kind for kind, name in kind_decode.items()}
+
+script_path = os.path.realpath(__file__)
+path = os.path.dirname(script_path)
+
+#a variant, with its 1-based position and alleles as in the VCF file
+Variant = collections.namedtuple('Variant', ['ch', 'pos', 'ref', 'alt', 'kind'])
+
+#get the kind of a variant and the base to show for it (4 if none)
+def classify(ref, alt):
+    alt = alt.split(',')[0]
+    if len(ref) == 1 and len(alt) == 1 and alt in nucleotide_encode:
+        return (kind_encode['SNV'], nucleotide_encode[alt])
+    if len(alt) > len(ref) and alt.startswith(ref):
+        return (kind_encode['insertion'], 4)
+    if len(ref) > len(alt) and ref.startswith(alt):
+        return (kind_encode['deletion'], 4)
+    return (kind_encode['other'], 4)
+
+#variants of a chromosome, as columns
+class VariantColumns:
+    def __init__(self):
+        self.positions = array.array('I')
+        self.bases = bytearray()
+        self.kinds = bytearray()
+        self.allele_offsets = array.array('I')
+        self.allele_block = bytearray()
+
+    def add(self, pos, ref, alt):
+        kind, base = classify(ref, alt)
+        self.positions.append(pos)
+        self.kinds.append(kind)
+        self.bases.append(base)
+        self.allele_offsets.append(len(self.allele_block))
+        self.allele_block += (ref + '\t' + alt).encode()
+
+    #put the variants in order of position, if the VCF file wasn't sorted
+    def sort(self):
+        n = len(self.positions)
+        if all(self.positions[i] <= self.positions[i+1] for i in range(0, n - 1)):
+            return
+        order = sorted(range(0, n), key=self.positions.__getitem__)
+        ends = self.allele_offsets[1:] + array.array('I', [len(self.allele_block)])
+        block = bytearray()
+        offsets = array.array('I')
+        for i in order:
+            offsets.append(len(block))
+            block += self.allele_block[self.allele_offsets[i]:ends[i]]
+        self.positions = array.array('I', [self.positions[i] for i in order])
+        self.kinds = bytearray(self.kinds[i] for i in order)
+        self.bases = bytearray(self.bases[i] for i in order)
+        self.allele_offsets = offsets
+        self.allele_block = block
+
+#variant index: count, then columns (positions, allele offsets and the end of the
+#last alleles, kinds, bases), then alleles as "ref<tab>alt"
+def write_variant_index(ch, columns):
+    columns.sort()
+    index_path = os.path.join(path, ch + ".var")
+    with open(index_path, 'wb') as index_file:
+        index_file.write(len(columns.positions).to_bytes(4, byteorder='little', signed=False))
+        features.write_array(index_file, columns.positions)
+        features.write_array(index_file, columns.allele_offsets + array.array('I', [len(columns.allele_block)]))
+        index_file.write(columns.kinds)
+        index_file.write(columns.bases)
+        index_file.write(columns.allele_block)
+
+#convert a VCF file (optionally gzipped) into a variant index per chromosome, replacing any others
+def convert(vcf_path):
+    ch_columns = {}
+    opener = gzip.open if vcf_path.endswith('.gz') else open
+    with opener(vcf_path, 'rt') as vcf_file:
+        for line in vcf_file:
+            if line[0] == '#':
+                continue
+            fields = line.split('\t', 5)
+            if len(fields) < 5:
+                continue
+            ch = sequence.get_ch(fields[0])
+            if ch is None:
+                continue
+            if ch not in ch_columns:
+                ch_columns[ch] = VariantColumns()
+                print("Chromosome " + ch if ch != 'mt' else "Mitochondrial")
+            ch_columns[ch].add(int(fields[1]), fields[3].upper(), fields[4].upper())
+    for index_path in glob.glob(os.path.join(path, "*.var")):
+        os.remove(index_path)
+    VariantIndex.ch_indexes.clear()
+    for ch, columns in ch_columns.items():
+        write_variant_index(ch, columns)
+    return sum(len(columns.positions) for columns in ch_columns.values())
+
+#per-chromosome variant index written by convert(), mapped rather than read
+class VariantIndex:
+    #indexes by chromosome, or None where there are no variants
+    ch_indexes = {}
+
+    #get the index of a chromosome, opening it on first use; None if there is none
+    @classmethod
+    def get_ch_index(cls, ch):
+        if ch not in cls.ch_indexes:
+            index_path = os.path.join(path, ch + ".var")
+            cls.ch_indexes[ch] = cls(ch, index_path) if os.path.isfile(index_path) else None
+        return cls.ch_indexes[ch]
+
+    def __init__(self, ch, index_path):
+        self.ch = ch
+        self.file = open(index_path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.n = n = int.from_bytes(self.data[0:4], byteorder='little', signed=False)
+        self.positions = features.get_array(self.data, 4, n)
+        self.allele_offsets = features.get_array(self.data, 4 + 4*n, n + 1)
+        self.kinds_offset = 8 + 8*n
+        self.bases_offset = 8 + 9*n
+        self.allele_block_offset = 8 + 10*n
+        #index of the variant after the last one looked up
+        self.cursor = 0
+
+    #get variant i as a Variant tuple
+    def get_variant(self, i):
+        start = self.allele_block_offset + self.allele_offsets[i]
+        end = self.allele_block_offset + self.allele_offsets[i+1]
+        ref, alt = self.data[start:end].decode().split('\t')
+        return Variant(self.ch, self.positions[i], ref, alt, kind_decode[self.data[self.kinds_offset + i]])
+
+    #get the index of the first variant at or after pos
+    #rows are looked up in order while scrolling, so first try moving on from the last one
+    def seek(self, pos):
+        positions = self.positions
+        i = self.cursor
+        for step in range(0, 4):
+            if i > 0 and positions[i-1] >= pos:
+                i -= 1
+            elif i < self.n and positions[i] < pos:
+                i += 1
+            else:
+                self.cursor = i
+                return i
+        self.cursor = bisect.bisect_left(positions, pos)
+        return self.cursor
+
+    #get (position, kind, base) of the variants at positions [start, end), for drawing
+    def get_calls(self, start, end):
+        calls = []
+        i = self.seek(start)
+        while i < self.n and self.positions[i] < end:
+            calls.append((self.positions[i], self.data[self.kinds_offset + i], self.data[self.bases_offset + i]))
+            i += 1
+        return calls
+
+    #stream variants at positions start to end (inclusive)
+    def iter_range(self, start, end):
+        i = bisect.bisect_left(self.positions, start)
+        while i < self.n and self.positions[i] <= end:
+            yield self.get_variant(i)
+            i += 1
+
+#get a list of variants in a chromosome at positions start to end (inclusive)
+def query(ch, start, end):
+    index = VariantIndex.get_ch_index(ch)
+    return list(index.iter_range(start, end)) if index else []
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or not os.path.isfile(sys.argv[1]):
+        print("Usage: variants.py <file.vcf[.gz]> [dir=<path>]", file=sys.stderr)
+        sys.exit(1)
+    for arg in sys.argv[2:]:
+        match = re.fullmatch(r'dir=(.+)', arg)
+        if match:
+            path = os.path.realpath(match.group(1))
+    count = convert(sys.argv[1])
+    print("{} variants indexed".format(count))
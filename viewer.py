@@ -1,6 +1,7 @@
 #!/usr/bin/python3
 
-import os, sys, curses, time, configparser, re, bisect, shutil, copy, collections
+import os, sys, io, curses, time, re, bisect, copy, collections, array, itertools, asyncio
+import features, genes, liftover, sequence, variants, tracks
 
 chromosomes = [
     '1', '2', '3', '4', '5', '6', '7', '8', '9', '10',
@@ -16,28 +17,15 @@ nucleotide_decoding = {
     4 : '?'
 }
 
-feature_encode = {
-    'gap' : 0,
-    'exon' : 1,
-    'CDS' : 2,
-    'pseudogene' : 3,
-    'gene' : 4,
-    'tRNA' : 5,
-    'rRNA' : 6,
-    'miRNA' : 7
-} # 0-63
+feature_encode = features.feature_encode # 0-63
 feature_mask = 63
 end_encode = 128
 
-strand_decode = {
-    1 : '+',
-    2 : '-',
-    3 : '.'
-}
-
 # The pair numbers to which the different colors will be assigned
 PAIR_UNK = 0
 PAIR_HIGHLIGHT = 1
+PAIR_SNV = 2
+PAIR_INDEL = 3
 # All the following get 4 pairs each, one per nucleotide
 PAIR_NONE = 8
 PAIR_EXON_PSEUDO = 12
@@ -48,6 +36,10 @@ PAIR_INTRON = 28
 PAIR_TRNA = 32
 PAIR_RRNA = 36
 PAIR_MIRNA = 40
+PAIR_SMALL_RNA = 44
+PAIR_REGULATORY = 48
+# User tracks get 4 pairs each from here on
+PAIR_TRACK = 52
 
 #Foreground color
 nucleotide_colors = {
@@ -68,12 +60,75 @@ region_colors = {
     PAIR_INTRON : 232,
     PAIR_TRNA : 106,
     PAIR_RRNA : 65,
-    PAIR_MIRNA : 136
+    PAIR_MIRNA : 136,
+    PAIR_SMALL_RNA : 126,
+    PAIR_REGULATORY : 29
 }
 
+#feature types that decide the color of a base, in groups colored alike,
+#highest priority first; other types are kept but not colored
+feature_classes = [
+    ('gap', ['gap']),
+    ('CDS', ['CDS']),
+    ('tRNA', ['tRNA']),
+    ('rRNA', ['rRNA']),
+    ('miRNA', ['miRNA']),
+    ('small RNA', ['snRNA', 'snoRNA', 'scRNA', 'Y_RNA', 'vault_RNA', 'RNase_MRP_RNA', 'RNase_P_RNA', 'telomerase_RNA', 'ncRNA']),
+    ('exon', ['exon']),
+    ('regulatory', ['enhancer', 'promoter', 'silencer', 'insulator', 'TATA_box', 'CAAT_signal',
+        'GC_rich_promoter_region', 'transcriptional_cis_regulatory_region', 'locus_control_region',
+        'enhancer_blocking_element', 'protein_binding_site', 'DNaseI_hypersensitive_site',
+        'response_element', 'epigenetically_modified_region', 'imprinting_control_region']),
+    ('gene', ['gene']),
+    ('pseudogene', ['pseudogene'])
+]
+
+#bits of the feature types in each group
+class_masks = [sum(1 << feature_encode[name] for name in names) for group, names in feature_classes]
+
+#get the pair of the bases in a set of groups (as bits, in the order above): the first
+#4 pairs from it, one per nucleotide, or PAIR_UNK for exons outside genes and -1 for gaps
+def get_class_pair(class_bits):
+    present = [group for n, (group, names) in enumerate(feature_classes) if class_bits & (1 << n)]
+    if 'gap' in present:
+        return -1
+    for group, pair in (('CDS', PAIR_CDS), ('tRNA', PAIR_TRNA), ('rRNA', PAIR_RRNA), ('miRNA', PAIR_MIRNA), ('small RNA', PAIR_SMALL_RNA)):
+        if group in present:
+            return pair
+    if 'exon' in present:
+        if 'gene' in present:
+            return PAIR_UTR_GENE
+        if 'pseudogene' in present:
+            return PAIR_EXON_PSEUDO
+        return PAIR_UNK
+    if 'regulatory' in present:
+        return PAIR_REGULATORY
+    if 'gene' in present or 'pseudogene' in present:
+        return PAIR_INTRON
+    return PAIR_NONE
+
+#pair for every set of groups, so that a change of features is resolved with a lookup
+pair_table = [get_class_pair(class_bits) for class_bits in range(0, 1 << len(feature_classes))]
+
+#get the pair for a set of features present (as bits, by code)
+def get_feature_pair(feature_bits):
+    class_bits = 0
+    for n, mask in enumerate(class_masks):
+        if feature_bits & mask:
+            class_bits |= 1 << n
+    return pair_table[class_bits]
+
+#Background color of user tracks, by lowercase name, and the ones given in turn to tracks not named
+track_colors = {}
+track_default_colors = [24, 94, 54, 22, 88, 58]
+#(name, pair) of the user tracks shown, last on top; found when first needed
+user_tracks = None
+
 #Other colors
 other_colors = {
-    PAIR_HIGHLIGHT : 11
+    PAIR_HIGHLIGHT : 11,
+    PAIR_SNV : 13,
+    PAIR_INDEL : 208
 }
 
 script_path = os.path.realpath(__file__)
@@ -101,34 +156,342 @@ highlighter = {
     'kozak' : ("YRYVATGG", 1)
 }
 
+display = {
+    'dim repeats' : True,
+    'translate' : False,
+    'variants' : True,
+    'tracks' : True,
+    'frame rate' : 60,
+    'speed' : 800
+}
+
+#slowest and fastest scrolling by itself, in base-pairs per second
+speed_limits = (10, 100000000)
+
+#limits on the Readers kept open at once, in number and bytes held, and on decoded lines kept
+reader_pool = {
+    'readers' : 8,
+    'memory' : 256 << 20,
+    'rows' : 4096
+}
+
+#nucleotides matched by each consensus sequence symbol
+consensus_nucleotides = {
+    'A' : (0,),
+    'C' : (1,),
+    'G' : (2,),
+    'T' : (3,),
+    'W' : (0, 3),
+    'S' : (1, 2),
+    'R' : (0, 2),
+    'Y' : (1, 3),
+    'M' : (0, 1),
+    'K' : (2, 3),
+    'B' : (1, 2, 3),
+    'D' : (0, 2, 3),
+    'H' : (0, 1, 3),
+    'V' : (0, 1, 2),
+    'N' : (0, 1, 2, 3)
+}
+
+consensus_complement = {
+    'A' : 'T', 'C' : 'G', 'G' : 'C', 'T' : 'A',
+    'W' : 'W', 'S' : 'S', 'R' : 'Y', 'Y' : 'R', 'M' : 'K', 'K' : 'M',
+    'B' : 'V', 'D' : 'H', 'H' : 'D', 'V' : 'B', 'N' : 'N'
+}
+
 ch_initial = "1"
 pos_initial = 1
 pos_percent = False
 paused = False
+#time when launching started (from time.perf_counter()), to measure startup latency
+launch_time = None
+first_frame_time = None
+show_startup_time = False
+#whether instrument.py is recording timings and counters
+profiling = False
+#file to record keys to, for replay.py
+record_path = None
+
+#glyphs for chromosome titles, 7 rows each
+  #####      ##    #######   #######  ##        ########  #######  ########  #######   #######  ##     ## ##    ##
+ ##   ##   ####   ##     ## ##     ## ##    ##  ##       ##     ## ##    ## ##     ## ##     ##  ##   ##   ##  ##                ##
+##     ##    ##          ##        ## ##    ##  ##       ##            ##   ##     ## ##     ##   ## ##     ####   ## ##  ##  ########
+##     ##    ##    #######   #######  ##    ##  #######  ########     ##     #######   ########    ###       ##    ### ### ##    ##
+##     ##    ##   ##               ## #########       ## ##     ##   ##     ##     ##        ##   ## ##      ##    ##  ##  ##    ##
+ ##   ##     ##   ##        ##     ##       ##  ##    ## ##     ##   ##     ##     ## ##     ##  ##   ##     ##    ##  ##  ##    ##
+  #####    ###### #########  #######        ##   ######   #######    ##      #######   #######  ##     ##    ##    ##  ##  ##     ####
+title_glyphs = {
+    '0' : [
+        "  #####    ",
+        " ##   ##   ",
+        "##     ##  ",
+        "##     ##  ",
+        "##     ##  ",
+        " ##   ##   ",
+        "  #####    ",
+    ],
+    '1' : [
+        "  ##   ",
+        "####   ",
+        "  ##   ",
+        "  ##   ",
+        "  ##   ",
+        "  ##   ",
+        "###### ",
+    ],
+    '2' : [
+        " #######  ",
+        "##     ## ",
+        "       ## ",
+        " #######  ",
+        "##        ",
+        "##        ",
+        "######### ",
+    ],
+    '3' : [
+        " #######  ",
+        "##     ## ",
+        "       ## ",
+        " #######  ",
+        "       ## ",
+        "##     ## ",
+        " #######  ",
+    ],
+    '4' : [
+        "##        ",
+        "##    ##  ",
+        "##    ##  ",
+        "##    ##  ",
+        "######### ",
+        "      ##  ",
+        "      ##  ",
+    ],
+    '5' : [
+        "######## ",
+        "##       ",
+        "##       ",
+        "#######  ",
+        "      ## ",
+        "##    ## ",
+        " ######  ",
+    ],
+    '6' : [
+        " #######  ",
+        "##     ## ",
+        "##        ",
+        "########  ",
+        "##     ## ",
+        "##     ## ",
+        " #######  ",
+    ],
+    '7' : [
+        "######## ",
+        "##    ## ",
+        "    ##   ",
+        "   ##    ",
+        "  ##     ",
+        "  ##     ",
+        "  ##     ",
+    ],
+    '8' : [
+        " #######  ",
+        "##     ## ",
+        "##     ## ",
+        " #######  ",
+        "##     ## ",
+        "##     ## ",
+        " #######  ",
+    ],
+    '9' : [
+        " #######  ",
+        "##     ## ",
+        "##     ## ",
+        " ######## ",
+        "       ## ",
+        "##     ## ",
+        " #######  ",
+    ],
+    'X' : [
+        "##     ## ",
+        " ##   ##  ",
+        "  ## ##   ",
+        "   ###    ",
+        "  ## ##   ",
+        " ##   ##  ",
+        "##     ## ",
+    ],
+    'Y' : [
+        "##    ## ",
+        " ##  ##  ",
+        "  ####   ",
+        "   ##    ",
+        "   ##    ",
+        "   ##    ",
+        "   ##    ",
+    ],
+    'm' : [
+        "           ",
+        "           ",
+        "## ##  ##  ",
+        "### ### ## ",
+        "##  ##  ## ",
+        "##  ##  ## ",
+        "##  ##  ## ",
+    ],
+    't' : [
+        "         ",
+        "   ##    ",
+        "######## ",
+        "   ##    ",
+        "   ##    ",
+        "   ##    ",
+        "    #### ",
+    ],
+}
+
+#rows of the title of each chromosome, joined once
+title_rows = {}
+
+def get_title_rows(title):
+    if title not in title_rows:
+        title_rows[title] = ["".join(title_glyphs[C][n] for C in title) for n in range(0, len(title_glyphs['0']))]
+    return title_rows[title]
+
+#get the reverse complement of a consensus sequence
+def reverse_consensus(consensus):
+    return "".join(consensus_complement[c] for c in reversed(consensus))
+
+#find enabled highlights in a list of nucleotides (None or 4 match nothing)
+#returns a list of flags, one per nucleotide; minus matches the (-) strand
+def find_highlights(nucleotides, minus=False):
+    flags = [False] * len(nucleotides)
+    for name, enabled in highlight.items():
+        if not enabled:
+            continue
+        consensus, max_differences = highlighter[name]
+        if minus:
+            consensus = reverse_consensus(consensus)
+        symbols = [consensus_nucleotides[c] for c in consensus]
+        length = len(symbols)
+        for start in range(0, len(nucleotides) - length + 1):
+            differences = 0
+            for n in range(0, length):
+                if nucleotides[start + n] not in symbols[n]:
+                    differences += 1
+                    if differences > max_differences:
+                        break
+            else:
+                for n in range(start, start + length):
+                    flags[n] = True
+    return flags
+
+#get the attribute for a color pair (replaced by headless.py, as curses needs a terminal for it)
+color_pair = curses.color_pair
+#signal that a command found nothing (also replaced by headless.py)
+beep = curses.beep
+
+#open a data file for reading (replaced by instrument.py to count reads)
+def open_data(file_path):
+    return open(file_path, 'rb')
+
+#get the user tracks converted with tracks.py, giving each a color pair
+#tracks are listed in the order of config.ini, then by name
+def get_user_tracks():
+    global user_tracks
+    if user_tracks is None:
+        user_tracks = []
+        if os.path.isdir(os.path.join(path, "tracks")):
+            names = tracks.get_track_names()
+            #config.ini names are lowercase
+            order = list(track_colors.keys())
+            names.sort(key=lambda name: order.index(name.lower()) if name.lower() in order else len(order))
+            for n, name in enumerate(names):
+                pair = PAIR_TRACK + 4*n
+                region_colors[pair] = track_colors.get(name.lower(), track_default_colors[n % len(track_default_colors)])
+                user_tracks.append((name, pair))
+    return user_tracks
+
+#get, for each base of positions [start, end), the pair of the top user track there (or None)
+def get_track_pairs(ch, start, end):
+    track_pairs = None
+    for name, pair in get_user_tracks():
+        index = tracks.TrackIndex.get_ch_index(name, ch)
+        if index is None:
+            continue
+        for range_start, range_end in index.get_ranges(start, end):
+            if track_pairs is None:
+                track_pairs = [None] * (end - start)
+            for x in range(max(range_start, start) - start, min(range_end, end) - start):
+                track_pairs[x] = pair
+    return track_pairs
 
 class Reader:
-    ch_readers = {}
+    #open Readers, least recently used first
+    ch_readers = collections.OrderedDict()
+    #where closed Readers were left, to open them there again
+    ch_states = {}
+    pool_stats = {
+        'hits' : 0,
+        'misses' : 0,
+        'evictions' : 0
+    }
 
+    #get the open Reader of a chromosome, or open one near a position (negative counts from the end)
     @classmethod
-    def get_ch_reader(cls, ch):
-        if ch not in cls.ch_readers:
-            return cls(ch, 0)
-        return cls.ch_readers[ch]
-
-    #apply feature (start/end of region) to self.current_features
+    def get_ch_reader(cls, ch, pos=1):
+        if ch in cls.ch_readers:
+            cls.pool_stats['hits'] += 1
+            cls.ch_readers.move_to_end(ch)
+            return cls.ch_readers[ch]
+        cls.pool_stats['misses'] += 1
+        return cls(ch, pos)
+
+    #close the least recently used Readers while there are too many, or they hold too much
+    @classmethod
+    def evict(cls):
+        while len(cls.ch_readers) > max(reader_pool['readers'], 2) or (len(cls.ch_readers) > 2 and
+                sum(reader.size for reader in cls.ch_readers.values()) > reader_pool['memory']):
+            ch, reader = cls.ch_readers.popitem(last=False)
+            cls.ch_states[ch] = reader.get_state()
+            reader.close()
+            cls.pool_stats['evictions'] += 1
+
+    #close all Readers, forgetting where they were
+    @classmethod
+    def clear(cls):
+        for reader in cls.ch_readers.values():
+            reader.close()
+        cls.ch_readers.clear()
+        cls.ch_states.clear()
+
+    #forget all features present
+    def clear_features(self):
+        #features present, as bits by code, and how many of each overlap here
+        self.feature_bits = 0
+        self.feature_counts = array.array('I', bytes(4*(feature_mask+1)))
+        #pair of the bases here, as found by get_feature_pair()
+        self.feature_pair = PAIR_NONE
+
+    #apply feature (start/end of region) to self.feature_bits and self.feature_counts
+    #the pair is only looked up again when the set of features present changes
     def apply_feature(self, feat):
+        code = feat & feature_mask
         #end of region
         if feat & end_encode:
-            if (feat & feature_mask) not in self.current_features:
+            if self.feature_counts[code] == 0:
                 return #D
-            self.current_features[feat & feature_mask] -= 1
-            if self.current_features[feat & feature_mask] == 0:
-                del self.current_features[feat & feature_mask]
+            self.feature_counts[code] -= 1
+            if self.feature_counts[code] > 0:
+                return
+            self.feature_bits &= ~(1 << code)
         #start of region
         else:
-            if (feat & feature_mask) not in self.current_features:
-                self.current_features[feat & feature_mask] = 0
-            self.current_features[feat & feature_mask] += 1
+            self.feature_counts[code] += 1
+            if self.feature_counts[code] > 1:
+                return
+            self.feature_bits |= 1 << code
+        self.feature_pair = get_feature_pair(self.feature_bits)
 
     #get extra info about the current feature in metadata file (gene name, CDS phase)
     def get_feature_info(self):
@@ -148,15 +511,11 @@ class Reader:
             self.mt_file.read(1)
         return ""
 
-    #apply current feature, get its info, get next feature from metadata file
+    #apply current feature, skip its info, get next feature from metadata file
     def update_features(self):
         self.cur_feat_pos = self.next_pos
         self.apply_feature(self.next_feat)
-        info = self.get_feature_info()
-        if info:
-            self.current_info_strand = ord(info[0])
-            self.current_info = info[1:]
-            self.prev_info_pos = self.next_pos
+        self.get_feature_info()
         dword = self.mt_file.read(4)
         if dword == b"":
             self.next_pos = None
@@ -181,7 +540,7 @@ class Reader:
             self.mt_file.seek(self.mt_file.tell() - 2)
         return cur_feat
 
-    #updates self.current_features and seeks metadata file backwards
+    #updates the features present and seeks metadata file backwards
     #opposite of update_features()
     def update_features_backwards(self):
         self.next_pos = self.cur_feat_pos
@@ -210,16 +569,16 @@ class Reader:
             self.cur_feat_pos = None
         self.next_feat = lost_feat # new next (previous current)
 
-    #updates self.current_features and seeks metadata to start
+    #updates the features present and seeks metadata to start
     def jump_to_mt_start(self):
         self.mt_file.seek(0)
         self.cur_feat_pos = None
         self.next_pos = int.from_bytes(self.mt_file.read(4), byteorder='little', signed=False)
         self.next_feat = int.from_bytes(self.mt_file.read(1), byteorder='little', signed=False)
         self.pos = 0
-        self.current_features.clear()
+        self.clear_features()
 
-    #updates self.current_features and seeks metadata to end
+    #updates the features present and seeks metadata to end
     def jump_to_mt_end(self):
         self.mt_file.seek(0, 2)
         self.next_pos = self.cur_feat_pos = None
@@ -227,7 +586,7 @@ class Reader:
         self.cur_feat_pos = int.from_bytes(self.mt_file.read(4), byteorder='little', signed=False)
         self.mt_file.seek(0, 2)
         self.next_feat = None
-        self.current_features.clear()
+        self.clear_features()
 
     #gets CDS phase at self.pos
     def get_cds_phase(self):
@@ -236,8 +595,8 @@ class Reader:
         if saved_fpos == self.cds_phase_cache['saved_fpos']:
             start_phase = self.cds_phase_cache['start_phase']
             start_pos = self.cds_phase_cache['start_pos']
-            relative_pos = self.pos - start_pos
-            r = (start_phase + relative_pos%3) | (((relative_pos // 3) & 1) << 2)
+            relative_pos = self.pos - start_pos + start_phase
+            r = (relative_pos % 3) | (((relative_pos // 3) & 1) << 2)
         #find CDS and read its data, then restore file position
         else:
             prev_feat = self.unget_feature()
@@ -248,13 +607,38 @@ class Reader:
                 self.cds_phase_cache['start_phase'] = start_phase = (3 - int.from_bytes(self.mt_file.read(1), byteorder='little', signed=False)) % 3
                 self.mt_file.seek(self.mt_file.tell() - 6)
                 self.cds_phase_cache['start_pos'] = start_pos = int.from_bytes(self.mt_file.read(4), byteorder='little', signed=False)
-                relative_pos = self.pos - start_pos
-                r = (start_phase + relative_pos%3) | (((relative_pos // 3) & 1) << 2)
+                relative_pos = self.pos - start_pos + start_phase
+                r = (relative_pos % 3) | (((relative_pos // 3) & 1) << 2)
             else:
                 r = 0
             self.mt_file.seek(saved_fpos)
         return r
 
+    #load soft-masked (repeat) intervals, stored as deltas in mask file
+    def load_masks(self):
+        self.mask_starts = array.array('I')
+        self.mask_ends = array.array('I')
+        mask_path = os.path.join(path, self.ch + ".msk")
+        if not os.path.isfile(mask_path):
+            return
+        deltas = array.array('I')
+        with open(mask_path, 'rb') as mask_file:
+            deltas.frombytes(mask_file.read())
+        if sys.byteorder == 'big':
+            deltas.byteswap()
+        bounds = array.array('I', itertools.accumulate(deltas))
+        self.mask_starts = bounds[0::2]
+        self.mask_ends = bounds[1::2]
+
+    #get soft-masked intervals (start, end) overlapping positions [start, end)
+    def get_masked_intervals(self, start, end):
+        intervals = []
+        index = bisect.bisect_right(self.mask_ends, start)
+        while index < len(self.mask_starts) and self.mask_starts[index] < end:
+            intervals.append((self.mask_starts[index], self.mask_ends[index]))
+            index += 1
+        return intervals
+
     #get byte from data file
     def get_byte(self):
         self.byte = self.file.read(1)
@@ -269,26 +653,56 @@ class Reader:
         self.n = (self.pos-1) % 4
         self.get_byte()
 
+    #get the position and feature state, as restored by set_state()
+    def get_state(self):
+        return {
+            'pos' : self.pos,
+            'mt_fpos' : self.mt_file.tell(),
+            'cur_feat_pos' : self.cur_feat_pos,
+            'next_pos' : self.next_pos,
+            'next_feat' : self.next_feat,
+            'feature_counts' : array.array('I', self.feature_counts)
+        }
+
+    #go back to a saved state; jump_to() must follow
+    def set_state(self, state):
+        self.mt_file.seek(state['mt_fpos'])
+        self.pos = state['pos']
+        self.cur_feat_pos = state['cur_feat_pos']
+        self.next_pos = state['next_pos']
+        self.next_feat = state['next_feat']
+        self.feature_counts = array.array('I', state['feature_counts'])
+        self.feature_bits = sum(1 << code for code, count in enumerate(self.feature_counts) if count)
+        self.feature_pair = get_feature_pair(self.feature_bits)
+
     def __init__(self, ch, pos, pos_is_percent=False):
         self.ch = ch
+        self.closed = False
         ch_path = os.path.join(path, self.ch + ".bin")
-        self.file = open(ch_path, 'rb')
+        self.file = open_data(ch_path)
         ch_size = self.file.read(4)
         self.ch_size = int.from_bytes(ch_size, byteorder='little', signed=False)
 
         if pos_is_percent:
             pos = (pos * self.ch_size) // 100
-        if pos_initial <= 0:
+        if pos <= 0:
             pos = self.ch_size + pos + 1
 
         mt_path = os.path.join(path, self.ch + ".dat")
-        self.mt_file = open(mt_path, 'rb')
+        self.mt_file = open_data(mt_path)
 
-        self.current_features = {}
-        self.current_info = ""
-        self.prev_info_pos = None
+        self.clear_features()
 
-        self.jump_to_mt_start()
+        self.load_masks()
+        #bytes held, counted against reader_pool['memory']
+        self.size = 8*len(self.mask_starts) + 2*io.DEFAULT_BUFFER_SIZE
+
+        #reopening a closed Reader starts from where it was, instead of replaying features from an end
+        state = Reader.ch_states.pop(ch, None)
+        if state:
+            self.set_state(state)
+        else:
+            self.jump_to_mt_start()
         self.jump_to(pos)
 
         self.cds_phase_cache = {
@@ -298,6 +712,8 @@ class Reader:
         }
 
         Reader.ch_readers[ch] = self
+        Reader.ch_readers.move_to_end(ch)
+        Reader.evict()
 
     #read nucleotide at current position
     def read(self):
@@ -347,6 +763,11 @@ class Reader:
         while self.pos < P:
             self.advance_nucleotide()
 
+    def close(self):
+        self.closed = True
+        self.file.close()
+        self.mt_file.close()
+
     def __del__(self):
         self.file.close()
         self.mt_file.close()
@@ -363,8 +784,14 @@ class View:
             self.pos = pos
             self.title_pos = None
 
+        #get a Reader again if the pool has closed this one
+        def check_reader(self):
+            if self.reader.closed:
+                self.reader = Reader.get_ch_reader(self.reader.ch, min(max(self.pos, 1), self.reader.ch_size))
+
         #move reader to this position
         def sync_reader(self):
+            self.check_reader()
             if self.pos == self.reader.pos:
                 pass
             elif self.pos == self.reader.pos+1:
@@ -401,14 +828,15 @@ class View:
         def next_ch(self):
             self.pos = self.pos - self.reader.ch_size
             ch = self.next_ch_name()
-            self.reader = Reader.get_ch_reader(ch)
+            self.reader = Reader.get_ch_reader(ch, max(self.pos, 1))
             self.title_pos = -10
             self.sync_reader()
 
         #jump from start of chromosome to end of previous
         def prev_ch(self):
             ch = self.prev_ch_name()
-            self.reader = Reader.get_ch_reader(ch)
+            #opened at its last base, if not open
+            self.reader = Reader.get_ch_reader(ch, -1)
             self.pos = self.reader.ch_size + self.pos
             if self.pos > self.reader.ch_size:
                 self.pos -= scrw-1
@@ -454,6 +882,52 @@ class View:
             for l in range(0, n):
                 self.next_line()
 
+        #move a number of lines forward, as next_line() would but without stopping at
+        #each one, and not past the point where the view can't be scrolled down
+        def skip_lines(self, n):
+            while n > 0:
+                if self.istitle():
+                    k = min(n, -self.title_pos)
+                    self.title_pos += k
+                    if self.title_pos == 0:
+                        self.title_pos = None
+                elif self.next_ch_name() is None:
+                    k = min(n, max((self.reader.ch_size - (scrw-1)*scrh - self.pos)//(scrw-1) + 1, 0))
+                    if k == 0:
+                        break
+                    self.pos += k*(scrw-1)
+                else:
+                    #lines left before the next chromosome
+                    k = max((self.reader.ch_size - self.pos)//(scrw-1), 0)
+                    if k == 0:
+                        self.next_ch()
+                        k = 1
+                    else:
+                        k = min(n, k)
+                        self.pos += k*(scrw-1)
+                n -= k
+
+        #move a number of lines back, as prev_line() would but without stopping at
+        #each one, and not past the title of the first chromosome
+        def skip_lines_back(self, n):
+            while n > 0:
+                if not self.istitle():
+                    if self.pos <= 1:
+                        self.title_pos = -1
+                        k = 1
+                    else:
+                        k = min(n, (self.pos - 1 + scrw-2)//(scrw-1))
+                        self.pos -= k*(scrw-1)
+                elif self.title_pos == -10:
+                    if self.prev_ch_name() is None:
+                        break
+                    self.prev_ch()
+                    k = 1
+                else:
+                    k = min(n, self.title_pos + 10)
+                    self.title_pos -= k
+                n -= k
+
         #check check if view should jump to next chromosome, and do it if so
         def check_ch_end(self):
             if self.pos > self.reader.ch_size and (self.next_ch_name() is not None):
@@ -468,268 +942,111 @@ class View:
         def can_scroll_up(self):
             return (not self.istitle()) or (self.title_pos > -10) or (self.prev_ch_name() is not None)
 
+    #a decoded screen line, either part of a chromosome title or a list of cells
+    #cells are (nucleotide, pair, attribute), or None in the chromosome margins
+    class Row:
+        def __init__(self, reader, start, title=None):
+            self.reader = reader
+            self.start = start
+            self.title = title
+            self.cells = []
+            #nucleotides preceding the first cell, for highlighting
+            self.before = []
+            #amino acids at the middle base of each codon, computed when needed
+            self.amino = None
+
+    #decoded lines of every view, by chromosome, position, width and display settings
+    row_cache = collections.OrderedDict()
+    row_cache_stats = {
+        'hits' : 0,
+        'misses' : 0
+    }
+
     def __init__(self, reader, stdscr):
         self.screen = stdscr
         self.top_pos = self.Pos(reader, reader.pos)
+        #decoded lines on screen, from top_pos, in (+)-strand order
+        self.rows = []
+        #whether the (-) strand is displayed (the screen is rotated 180 degrees)
+        self.minus = False
+        #type of feature that [ and ] jump to
+        self.feature_type = 'gene'
+        #attribute of the status line, to tell panes apart
+        self.status_attr = 0
 
     #print status line on top
     def print_status(self):
-        status = "{} ({:.3f}%)".format(self.top_pos.pos, self.top_pos.pos*100/self.top_pos.reader.ch_size)
-        if self.top_pos.reader.current_info:
-            status += " {} ({})".format(self.top_pos.reader.current_info, strand_decode[self.top_pos.reader.current_info_strand])
+        global scrw
+        pos = self.top_pos.pos
+        reader = self.top_pos.reader
+        if self.minus and self.rows and self.rows[-1].title is None:
+            reader = self.rows[-1].reader
+            pos = min(self.rows[-1].start + scrw-2, reader.ch_size)
+        status = "{} ({:.3f}%)".format(pos, pos*100/reader.ch_size)
+        if self.minus:
+            status += " (-)"
+        if not paused:
+            status += " {} bp/s".format(display['speed'])
+        gene = self.get_screen_gene()
+        if gene:
+            status += " {} ({})".format(gene.info, gene.strand)
 
-        self.screen.addstr(0, 0, status)
+        self.screen.addstr(0, 0, status, self.status_attr)
 
-    #set the <number> characters before the last written one to a color pair
-    def set_prev_pairs(self, number, pair):
+    #get the gene starting last on screen, from the feature index rather than the Reader,
+    #which (with lines taken from the row cache) may not have passed its start
+    def get_screen_gene(self):
         global scrw, scrh
-        x = self.fillx
-        y = self.filly
-        for n in range(0, number):
-            x -= 1
-            if x < 0:
-                x = scrw-2
-                y -= 1
-                if y < 0:
-                    break
-            self.screen.chgat(y, x, curses.color_pair(pair))
-
-    #match nucleotide with consensus sequence symbol
-    def match_consensus(self, nucleotide, consensus):
-        nucleotide = nucleotide_decoding[nucleotide]
-        return (
-            nucleotide == consensus
-            or consensus == 'N'
-            or consensus == 'W' and nucleotide in ['A', 'T']
-            or consensus == 'S' and nucleotide in ['C', 'G']
-            or consensus == 'R' and nucleotide in ['A', 'G']
-            or consensus == 'Y' and nucleotide in ['C', 'T']
-            or consensus == 'M' and nucleotide in ['A', 'C']
-            or consensus == 'K' and nucleotide in ['G', 'T']
-            or consensus == 'B' and nucleotide in ['C', 'G', 'T']
-            or consensus == 'D' and nucleotide in ['A', 'G', 'T']
-            or consensus == 'H' and nucleotide in ['A', 'C', 'T']
-            or consensus == 'V' and nucleotide in ['A', 'C', 'G']
-        )
-
-    #possibly apply highlight to preceding nucleotides, return pair for current one
-    def apply_highlight(self, reader):
-        global highlight, highlighter
-        pair = None
-        for name, enabled in highlight.items():
-            if enabled:
-                position = -1
-                differences = 0
-                while -position <= len(highlighter[name][0]):
-                    if not self.match_consensus(reader.last_nucleotides[position], highlighter[name][0][position]):
-                        differences += 1
-                        if differences > highlighter[name][1]:
-                            position = None
-                            break
-                    position -= 1
-                if position is not None:
-                    pair = PAIR_HIGHLIGHT
-                    #also set the pair before this
-                    self.set_prev_pairs(len(highlighter[name][0]) - 1, PAIR_HIGHLIGHT)
-        return pair
+        start = self.top_pos.pos
+        end = start + (scrw-1)*scrh
+        if end < 1:
+            return None
+        try:
+            genes = [gene for gene in features.iter_query(self.top_pos.reader.ch, max(start, 1), end, types=['gene']) if gene.start >= start]
+        except FileNotFoundError:
+            return None
+        #the last of those starting at the same place, as the Reader would have found
+        return max(reversed(genes), key=lambda gene: gene.start) if genes else None
 
     #get the appropriate nucleotide and pair for the current view position
     def get_nucleotide_and_pair(self, reader):
-        pair = None
         nucleotide = reader.read()
-        features = reader.current_features
-        highlight_pair = self.apply_highlight(reader)
-        if highlight_pair is not None:
-            pair = highlight_pair
-        else:
-            if feature_encode['gap'] in features:
-                nucleotide = 4
-                pair = PAIR_UNK
-            elif feature_encode['CDS'] in features:
-                if self.current_cds_phase is None:
-                    self.current_cds_phase = reader.get_cds_phase()
-                if self.current_cds_phase & 4:
-                    pair = PAIR_CDS2 + nucleotide
-                else:
-                    pair = PAIR_CDS + nucleotide
-                self.current_cds_phase += 1
-                if self.current_cds_phase & 3 == 3:
-                    self.current_cds_phase ^= 4
-                    self.current_cds_phase &= 4
-            elif feature_encode['tRNA'] in features:
-                pair = PAIR_TRNA + nucleotide
-            elif feature_encode['rRNA'] in features:
-                pair = PAIR_RRNA + nucleotide
-            elif feature_encode['miRNA'] in features:
-                pair = PAIR_MIRNA + nucleotide
-            elif feature_encode['exon'] in features:
-                if feature_encode['gene'] in features:
-                    pair = PAIR_UTR_GENE + nucleotide
-                elif feature_encode['pseudogene'] in features:
-                    pair = PAIR_EXON_PSEUDO + nucleotide
-                else:
-                    pair = PAIR_UNK
-            elif feature_encode['gene'] in features or feature_encode['pseudogene'] in features:
-                pair = PAIR_INTRON + nucleotide
+        pair = reader.feature_pair
+        if pair == PAIR_CDS:
+            #found again whenever the Reader has passed a feature boundary, such as a new CDS
+            if self.current_cds_phase is None or self.current_cds_feat_pos != reader.cur_feat_pos:
+                self.current_cds_phase = reader.get_cds_phase()
+                self.current_cds_feat_pos = reader.cur_feat_pos
+            if self.current_cds_phase & 4:
+                pair = PAIR_CDS2 + nucleotide
             else:
-                pair = PAIR_NONE + nucleotide
+                pair = PAIR_CDS + nucleotide
+            self.current_cds_phase += 1
+            if self.current_cds_phase & 3 == 3:
+                self.current_cds_phase ^= 4
+                self.current_cds_phase &= 4
+            return (nucleotide, pair)
+        if pair >= PAIR_NONE:
+            return (nucleotide, pair + nucleotide)
+        if pair < 0:
+            return (4, PAIR_UNK)
         return (nucleotide, pair)
 
     #print a line of the title of a chromosome
     def print_title_line(self, title, line):
-          #####      ##    #######   #######  ##        ########  #######  ########  #######   #######  ##     ## ##    ##
-         ##   ##   ####   ##     ## ##     ## ##    ##  ##       ##     ## ##    ## ##     ## ##     ##  ##   ##   ##  ##                ##
-        ##     ##    ##          ##        ## ##    ##  ##       ##            ##   ##     ## ##     ##   ## ##     ####   ## ##  ##  ########
-        ##     ##    ##    #######   #######  ##    ##  #######  ########     ##     #######   ########    ###       ##    ### ### ##    ##
-        ##     ##    ##   ##               ## #########       ## ##     ##   ##     ##     ##        ##   ## ##      ##    ##  ##  ##    ##
-         ##   ##     ##   ##        ##     ##       ##  ##    ## ##     ##   ##     ##     ## ##     ##  ##   ##     ##    ##  ##  ##    ##
-          #####    ###### #########  #######        ##   ######   #######    ##      #######   #######  ##     ##    ##    ##  ##  ##     ####
-
         global scrw
-        chars = {
-            '0' : [
-                "  #####    ",
-                " ##   ##   ",
-                "##     ##  ",
-                "##     ##  ",
-                "##     ##  ",
-                " ##   ##   ",
-                "  #####    ",
-            ],
-            '1' : [
-                "  ##   ",
-                "####   ",
-                "  ##   ",
-                "  ##   ",
-                "  ##   ",
-                "  ##   ",
-                "###### ",
-            ],
-            '2' : [
-                " #######  ",
-                "##     ## ",
-                "       ## ",
-                " #######  ",
-                "##        ",
-                "##        ",
-                "######### ",
-            ],
-            '3' : [
-                " #######  ",
-                "##     ## ",
-                "       ## ",
-                " #######  ",
-                "       ## ",
-                "##     ## ",
-                " #######  ",
-            ],
-            '4' : [
-                "##        ",
-                "##    ##  ",
-                "##    ##  ",
-                "##    ##  ",
-                "######### ",
-                "      ##  ",
-                "      ##  ",
-            ],
-            '5' : [
-                "######## ",
-                "##       ",
-                "##       ",
-                "#######  ",
-                "      ## ",
-                "##    ## ",
-                " ######  ",
-            ],
-            '6' : [
-                " #######  ",
-                "##     ## ",
-                "##        ",
-                "########  ",
-                "##     ## ",
-                "##     ## ",
-                " #######  ",
-            ],
-            '7' : [
-                "######## ",
-                "##    ## ",
-                "    ##   ",
-                "   ##    ",
-                "  ##     ",
-                "  ##     ",
-                "  ##     ",
-            ],
-            '8' : [
-                " #######  ",
-                "##     ## ",
-                "##     ## ",
-                " #######  ",
-                "##     ## ",
-                "##     ## ",
-                " #######  ",
-            ],
-            '9' : [
-                " #######  ",
-                "##     ## ",
-                "##     ## ",
-                " ######## ",
-                "       ## ",
-                "##     ## ",
-                " #######  ",
-            ],
-            'X' : [
-                "##     ## ",
-                " ##   ##  ",
-                "  ## ##   ",
-                "   ###    ",
-                "  ## ##   ",
-                " ##   ##  ",
-                "##     ## ",
-            ],
-            'Y' : [
-                "##    ## ",
-                " ##  ##  ",
-                "  ####   ",
-                "   ##    ",
-                "   ##    ",
-                "   ##    ",
-                "   ##    ",
-            ],
-            'm' : [
-                "           ",
-                "           ",
-                "## ##  ##  ",
-                "### ### ## ",
-                "##  ##  ## ",
-                "##  ##  ## ",
-                "##  ##  ## ",
-            ],
-            't' : [
-                "         ",
-                "   ##    ",
-                "######## ",
-                "   ##    ",
-                "   ##    ",
-                "   ##    ",
-                "    #### ",
-            ],
-        }
-        height = len(chars['0'])
-        n = height + line + 1
-        if n >= 0 and n < height:
-            length = 0
-            for C in title:
-                length += len(chars[C][0])
-            pad = (scrw - length)//2
+        rows = get_title_rows(title)
+        n = len(rows) + line + 1
+        if n >= 0 and n < len(rows):
+            pad = (scrw - len(rows[n]))//2
             if pad < 0:
                 pad = 0
             for m in range(0, pad):
                 self.print_char(" ", PAIR_UNK)
                 self.fillx += 1
-            for C in title:
-                for c in chars[C][n]:
-                    self.print_char(c, PAIR_UNK)
-                    self.fillx += 1
+            for c in rows[n]:
+                self.print_char(c, PAIR_UNK)
+                self.fillx += 1
             while self.fillx < scrw-1:
                 self.print_char(" ", PAIR_UNK)
                 self.fillx += 1
@@ -739,62 +1056,355 @@ class View:
                 self.fillx += 1
 
     #write a character and pair to the current screen position
-    def print_char(self, char, pair):
+    def print_char(self, char, pair, attr=0):
         try:
-            self.screen.addch(self.filly, self.fillx, char, curses.color_pair(pair))
+            self.screen.addch(self.filly, self.fillx, char, color_pair(pair) | attr)
         except curses.error:
             return False
 
-    #fill a portion of the screen with the appropriate characters and pairs
-    def fill(self, x, y, h):
+    #decode the line at a position into a Row, advancing the position to the next line
+    #lines already decoded (by this or another view) are taken from the row cache
+    def decode_row(self, pos):
         global scrw
-        self.fillx, self.filly = x, y
-        self.fillmaxy = self.filly + h
         self.current_cds_phase = None
+        if pos.istitle():
+            row = self.Row(pos.reader, pos.pos, (pos.reader.ch, pos.title_pos))
+            pos.next_line()
+            return row
+        key = (pos.reader.ch, pos.pos, scrw, display['dim repeats'], display['variants'], display['tracks'])
+        row = View.row_cache.get(key)
+        if row is not None:
+            View.row_cache.move_to_end(key)
+            View.row_cache_stats['hits'] += 1
+            pos.pos += scrw-1
+            pos.check_ch_end()
+            return row
+        View.row_cache_stats['misses'] += 1
+        row = self.Row(pos.reader, pos.pos)
+        masked = []
+        if display['dim repeats']:
+            masked = pos.reader.get_masked_intervals(pos.pos, pos.pos + scrw-1)
+        m = 0
+        calls = []
+        if display['variants']:
+            index = variants.VariantIndex.get_ch_index(pos.reader.ch)
+            if index:
+                calls = index.get_calls(pos.pos, pos.pos + scrw-1)
+        v = 0
+        track_pairs = None
+        if display['tracks'] and get_user_tracks():
+            track_pairs = get_track_pairs(pos.reader.ch, pos.pos, pos.pos + scrw-1)
+        for x in range(0, scrw-1):
+            if pos.ismargin():
+                row.cells.append(None)
+            else:
+                if x == 0:
+                    row.before = list(pos.reader.last_nucleotides)[:-1]
+                nucleotide, pair = self.get_nucleotide_and_pair(pos.reader)
+                if track_pairs and track_pairs[x] is not None and pair >= PAIR_NONE:
+                    pair = track_pairs[x] + nucleotide
+                #variants, merged in by position like the masks below
+                while v < len(calls) and calls[v][0] < pos.pos:
+                    v += 1
+                if v < len(calls) and calls[v][0] == pos.pos and nucleotide < 4:
+                    kind, base = calls[v][1:]
+                    if kind == 0:
+                        nucleotide = base
+                        pair = PAIR_SNV
+                    else:
+                        pair = PAIR_INDEL
+                while m < len(masked) and masked[m][1] <= pos.pos:
+                    m += 1
+                if m < len(masked) and masked[m][0] <= pos.pos:
+                    row.cells.append((nucleotide, pair, curses.A_DIM))
+                else:
+                    row.cells.append((nucleotide, pair, 0))
+            pos.advance()
+        pos.check_ch_end()
+        View.row_cache[key] = row
+        if len(View.row_cache) > reader_pool['rows']:
+            View.row_cache.popitem(last=False)
+        return row
+
+    #draw a decoded line on its screen line, mirrored if showing the (-) strand
+    def draw_row(self, i):
+        global scrh
+        if i < 0 or i >= len(self.rows) or self.rows[i] is None:
+            return
+        row = self.rows[i]
+        self.fillx = 0
+        self.filly = scrh-1 - i if self.minus else i
+        if row.title is not None:
+            ch, title_pos = row.title
+            self.print_title_line(ch, -11 - title_pos if self.minus else title_pos)
+            return
+        cells = row.cells
+        flags = None
+        if True in highlight.values():
+            nucleotides = row.before + [cell[0] if cell else None for cell in cells]
+            if i+1 < len(self.rows) and self.rows[i+1] is not None:
+                nucleotides += [cell[0] if cell else None for cell in self.rows[i+1].cells[0:20]]
+            flags = find_highlights(nucleotides, self.minus)[len(row.before):]
+        amino = None
+        if display['translate']:
+            if row.amino is None:
+                try:
+                    row.amino = sequence.Sequence.get_ch_sequence(row.reader.ch).translation_track(row.start, row.start + len(cells)-1)
+                except FileNotFoundError:
+                    row.amino = b""
+            amino = row.amino
+        order = range(len(cells)-1, -1, -1) if self.minus else range(0, len(cells))
+        for n in order:
+            cell = cells[n]
+            if cell is None:
+                self.print_char(' ', 0)
+            else:
+                nucleotide, pair, attr = cell
+                if self.minus and nucleotide < 4:
+                    #complement is a 2-bit NOT, and keeps the region's pairs
+                    if pair >= PAIR_NONE:
+                        pair += (nucleotide ^ 3) - nucleotide
+                    nucleotide ^= 3
+                char = nucleotide_decoding[nucleotide]
+                #amino acids replace the bases of codons in CDS
+                if amino and PAIR_CDS <= pair < PAIR_CDS2 + 4:
+                    char = chr(amino[n])
+                if flags and flags[n]:
+                    pair = PAIR_HIGHLIGHT
+                self.print_char(char, pair, attr)
+            self.fillx += 1
+
+    #redraw the whole screen from the decoded lines
+    def redraw(self):
+        for i in range(0, len(self.rows)):
+            self.draw_row(i)
+        self.print_status()
+
+    #draw the status again, over the line it covers, after it changed without scrolling
+    def update_status(self):
+        global scrh
+        self.draw_row(scrh-1 if self.minus else 0)
+        self.print_status()
+
+    #decode and draw a portion of the screen, in lines from the top position
+    def fill(self, x, y, h):
+        global scrh
+        del self.rows[scrh:]
+        while len(self.rows) < scrh:
+            self.rows.append(None)
 
         #create a copy of the current view top position
         pos = copy.copy(self.top_pos)
         pos.advance_lines(y)
 
-        while self.filly < self.fillmaxy:
-            self.fillx = 0
-            if pos.istitle():
-                self.print_title_line(pos.reader.ch, pos.title_pos)
-                pos.next_line()
-            else:
-                while self.fillx < scrw-1:
-                    if pos.ismargin():
-                        self.print_char(' ', 0)
-                    else:
-                        nucleotide, pair = self.get_nucleotide_and_pair(pos.reader)
-                        self.print_char(nucleotide_decoding[nucleotide], pair)
-                    pos.advance()
-                    self.fillx += 1
-                pos.check_ch_end()
-            self.filly += 1
+        for i in range(y, min(y+h, scrh)):
+            self.rows[i] = self.decode_row(pos)
+        #the line before may have highlights continuing into these
+        for i in range(max(y-1, 0), min(y+h, scrh)):
+            self.draw_row(i)
         self.print_status()
 
+    #move view forward a line, towards the end of the (+) strand
+    def next_line(self):
+        global scrh
+        self.top_pos.next_line()
+        self.rows.pop(0)
+        self.rows.append(None)
+        self.fill(x=0, y=scrh-1, h=1)
+
+    #move view back a line, towards the start of the (+) strand
+    def prev_line(self):
+        global scrh
+        self.top_pos.prev_line()
+        self.rows.pop()
+        self.rows.insert(0, None)
+        self.fill(x=0, y=0, h=1)
+        #the last line has lost the one after it
+        self.draw_row(scrh-1)
+
     #try to scroll view down a number of lines
     def scroll_down(self, n):
-        global scrw, scrh
-        while n > 0 and self.top_pos.can_scroll_down():
+        while n > 0 and (self.top_pos.can_scroll_up() if self.minus else self.top_pos.can_scroll_down()):
             self.screen.scroll(1)
-            self.top_pos.next_line()
-            self.fill(x=0, y=scrh-1, h=1)
+            if self.minus:
+                self.prev_line()
+            else:
+                self.next_line()
             n -= 1
-        if self.top_pos.reader.current_info and self.top_pos.reader.prev_info_pos and self.top_pos.reader.prev_info_pos < self.top_pos.pos:
-            self.top_pos.reader.current_info = ""
 
     #try to scroll view up a number of lines
     def scroll_up(self, n):
-        global scrw, scrh
-        while n > 0 and self.top_pos.can_scroll_up():
+        while n > 0 and (self.top_pos.can_scroll_down() if self.minus else self.top_pos.can_scroll_up()):
             self.screen.scroll(-1)
-            self.top_pos.prev_line()
-            self.fill(x=0, y=0, h=2)
+            if self.minus:
+                self.next_line()
+            else:
+                self.prev_line()
+            #the status line has been scrolled down with the rest
+            self.draw_row(len(self.rows)-2 if self.minus else 1)
             n -= 1
-        if self.top_pos.reader.current_info and self.top_pos.reader.prev_info_pos and self.top_pos.reader.prev_info_pos > self.top_pos.pos + (scrw-1)*scrh:
-            self.top_pos.reader.current_info = ""
+
+    #scroll the view a number of lines down the screen (up if negative)
+    #moving a screen or more repositions the view and decodes only the final screen
+    def scroll(self, n):
+        global scrh
+        if abs(n) < scrh:
+            if n > 0:
+                self.scroll_down(n)
+            elif n < 0:
+                self.scroll_up(-n)
+            return
+        if (n > 0) != self.minus:
+            self.top_pos.skip_lines(abs(n))
+        else:
+            self.top_pos.skip_lines_back(abs(n))
+        self.top_pos.sync_reader()
+        self.rows = []
+        self.screen.erase()
+        self.fill(x=0, y=0, h=scrh)
+
+    #ask for a distance in bases (such as 500, 20k or -1.5M) and scroll that far
+    def jump(self):
+        global scrw
+        text = self.prompt("Jump (bp, k or M): ")
+        match = re.fullmatch(r'([+-]?\d+(\.\d*)?)\s*([kKmM]?)', text)
+        if not match:
+            beep()
+            self.redraw()
+            return
+        distance = float(match.group(1)) * {'' : 1, 'k' : 1000, 'm' : 1000000}[match.group(3).lower()]
+        lines = round(distance / (scrw-1))
+        self.scroll(lines)
+        if abs(lines) < scrh:
+            self.redraw()
+
+    #ask for a position, as given on the command line, and go there
+    def goto_position(self):
+        text = self.prompt("Position: ")
+        prefixed = liftover.parse_prefixed(text)
+        if prefixed and prefixed[3] is None:
+            target = liftover.lift(*prefixed[0:3])
+            if target is None:
+                beep()
+                self.redraw()
+                return
+            self.goto(target[0], target[1])
+            return
+        match = re.fullmatch(r'(([1-9XY]|1\d|2[0-2]|mt)\.)?(-?\d+)(%?)', text)
+        if not match:
+            beep()
+            self.redraw()
+            return
+        ch = match.group(2) or self.top_pos.reader.ch
+        try:
+            #from the .bin header, rather than opening a Reader that goto() may not need
+            ch_size = sequence.Sequence.get_ch_sequence(ch).ch_size
+        except FileNotFoundError:
+            beep()
+            self.redraw()
+            return
+        pos = int(match.group(3))
+        if match.group(4):
+            pos = (pos * ch_size) // 100
+        if pos <= 0:
+            pos = ch_size + pos + 1
+        self.goto(ch, min(max(pos, 1), ch_size))
+
+    #switch between displaying bases and amino acids in CDS
+    def toggle_translation(self):
+        display['translate'] = not display['translate']
+        self.redraw()
+
+    #show or hide the variants loaded with variants.py
+    def toggle_variants(self):
+        display['variants'] = not display['variants']
+        self.rows = []
+        self.fill(x=0, y=0, h=scrh)
+
+    #show or hide the user tracks converted with tracks.py
+    def toggle_tracks(self):
+        display['tracks'] = not display['tracks']
+        self.rows = []
+        self.fill(x=0, y=0, h=scrh)
+
+    #switch between displaying the (+) and (-) strands, without decoding again
+    def toggle_strand(self):
+        self.minus = not self.minus
+        self.screen.erase()
+        self.redraw()
+
+    #move view to a chromosome position and redraw it
+    def goto(self, ch, pos):
+        global scrh
+        self.top_pos = self.Pos(Reader.get_ch_reader(ch), pos)
+        self.top_pos.sync_reader()
+        self.screen.clear()
+        self.fill(x=0, y=0, h=scrh)
+
+    #ask for a line of text on the bottom line of the screen
+    def prompt(self, text):
+        global scrh
+        self.screen.move(scrh-1, 0)
+        self.screen.clrtoeol()
+        self.screen.addstr(scrh-1, 0, text)
+        self.screen.nodelay(False)
+        curses.echo()
+        try:
+            answer = self.screen.getstr(scrh-1, len(text), 64).decode()
+        except curses.error:
+            answer = ""
+        curses.noecho()
+        self.screen.nodelay(True)
+        return answer.strip()
+
+    #ask for a gene name and jump to its start
+    def goto_gene(self):
+        global scrh
+        name = self.prompt("Gene: ")
+        index = genes.GeneIndex.get_index()
+        record = index.find(name) if (name and index) else None
+        if record is None:
+            beep()
+            self.redraw()
+            return
+        self.goto(record[1], record[2])
+
+    #ask for the type of feature that [ and ] jump to
+    #there are too many types to list them all, so only the current one is shown
+    def choose_feature_type(self):
+        types = list(features.feature_decode.values()) + ['gap end']
+        text = self.prompt("Feature type ({}): ".format(self.feature_type)).lower()
+        for feature_type in types:
+            if feature_type.lower() == text:
+                self.feature_type = feature_type
+                break
+        else:
+            if text:
+                beep()
+        self.redraw()
+
+    #jump to the next (or previous) start of a feature of the chosen type, along the (+) strand
+    def goto_feature(self, forward):
+        ch = self.top_pos.reader.ch
+        pos = max(self.top_pos.pos, 0)
+        while True:
+            try:
+                index = features.FeatureIndex.get_ch_index(ch)
+                #from the .bin header, as opening a Reader for each chromosome passed is slow
+                ch_size = sequence.Sequence.get_ch_sequence(ch).ch_size
+                found = index.next_start(min(pos, ch_size), self.feature_type) if forward else index.prev_start(min(pos, ch_size + 1), self.feature_type)
+            except FileNotFoundError:
+                found = None
+            #a gap at the end of a chromosome ends past it
+            if found is not None and found <= ch_size:
+                self.goto(ch, found)
+                return
+            i = chromosomes.index(ch) + (1 if forward else -1)
+            if i < 0 or i >= len(chromosomes):
+                beep()
+                return
+            ch = chromosomes[i]
+            pos = 0 if forward else 1 << 32
 
     #resize view to new size
     def resize(self, W, H):
@@ -802,48 +1412,376 @@ class View:
         self.screen.clear()
         scrw = W
         scrh = H
+        self.rows = []
         self.fill(x=0, y=0, h=scrh)
 
     def __del__(self):
         pass
 
+#views of several loci, one above the other, each in a window of its own
+#they share the Reader pool and row cache, so a pane on a region already seen costs little
+class Panes:
+    #most panes at once, and fewest lines in each
+    max_panes = 4
+    min_height = 5
+
+    def __init__(self, view, stdscr):
+        self.stdscr = stdscr
+        self.views = [view]
+        self.heights = [scrh]
+        #pane that keys act on
+        self.current = 0
+        #whether scrolling moves every pane
+        self.locked = False
+        #pane last acted on, and where each pane left the Reader of its last line
+        self.used = 0
+        self.states = [None]
+
+    #remember where a pane left the Reader it decodes lines with
+    def save_state(self, i):
+        view = self.views[i]
+        reader = view.rows[-1].reader if view.rows and view.rows[-1] else view.top_pos.reader
+        self.states[i] = None if reader.closed else (reader, reader.get_state())
+
+    #put the Reader back where the pane left it, if another pane has moved it
+    def load_state(self, i):
+        if self.states[i] is None:
+            return
+        reader, state = self.states[i]
+        if not reader.closed and reader.pos != state['pos']:
+            reader.set_state(state)
+            reader.jump_to(state['pos'])
+
+    #get the view of a pane ready to act on, with its height as scrh
+    def use(self, i):
+        global scrh
+        if i != self.used:
+            self.save_state(self.used)
+            self.load_state(i)
+            self.used = i
+        scrh = self.heights[i]
+        return self.views[i]
+
+    #get the panes that scrolling (or a scrolling key) moves
+    def get_scrolled(self, key=None):
+        if self.locked and key in (None, curses.KEY_NPAGE, curses.KEY_PPAGE):
+            return range(0, len(self.views))
+        return [self.current]
+
+    #split the screen evenly between the panes, and draw them all again
+    def layout(self, W, H):
+        n = len(self.views)
+        y = 0
+        for i in range(0, n):
+            self.heights[i] = H//n + (1 if i < H % n else 0)
+            if n == 1:
+                window = self.stdscr
+            else:
+                window = curses.newwin(self.heights[i], W, y, 0)
+                window.idlok(True)
+                window.scrollok(True)
+                window.nodelay(True)
+            self.views[i].screen = window
+            y += self.heights[i]
+        for i in range(0, n):
+            view = self.use(i)
+            view.status_attr = curses.A_REVERSE if n > 1 and (self.locked or i == self.current) else 0
+            view.resize(W, self.heights[i])
+        self.use(self.current)
+
+    #mark the status line of the panes that keys act on
+    def update_status(self):
+        for i in range(0, len(self.views)):
+            view = self.use(i)
+            view.status_attr = curses.A_REVERSE if len(self.views) > 1 and (self.locked or i == self.current) else 0
+            view.update_status()
+        self.use(self.current)
+
+    #open a pane below the current one, at the same place
+    def split(self):
+        H, W = self.stdscr.getmaxyx()
+        if len(self.views) >= self.max_panes or H//(len(self.views) + 1) < self.min_height:
+            beep()
+            return
+        view = self.views[self.current]
+        new_view = View(view.top_pos.reader, self.stdscr)
+        new_view.top_pos = copy.copy(view.top_pos)
+        new_view.minus = view.minus
+        new_view.feature_type = view.feature_type
+        self.current += 1
+        self.views.insert(self.current, new_view)
+        self.heights.insert(self.current, 0)
+        self.states.insert(self.current, None)
+        if self.used >= self.current:
+            self.used += 1
+        self.layout(W, H)
+
+    #close the current pane, giving its lines to the others
+    def close(self):
+        if len(self.views) == 1:
+            beep()
+            return
+        H, W = self.stdscr.getmaxyx()
+        del self.views[self.current]
+        del self.heights[self.current]
+        del self.states[self.current]
+        self.used = self.current = min(self.current, len(self.views) - 1)
+        self.load_state(self.current)
+        self.layout(W, H)
+
+    #act on a key about panes; returns False for any other key
+    def handle_key(self, key):
+        if key == ord('n'):
+            self.split()
+        elif key == ord('x'):
+            self.close()
+        elif key == ord('\t'):
+            self.current = (self.current + 1) % len(self.views)
+            self.update_status()
+        elif key == ord('l'):
+            self.locked = not self.locked
+            self.update_status()
+        elif key == curses.KEY_RESIZE and len(self.views) > 1:
+            H, W = self.stdscr.getmaxyx()
+            self.layout(W, H)
+        else:
+            return False
+        return True
+
+    #show the other panes again after a key in one changed what all of them show
+    def share_key(self, key):
+        for i in range(0, len(self.views)):
+            if i == self.current:
+                continue
+            view = self.use(i)
+            if key in (ord('v'), ord('u')):
+                view.rows = []
+                view.fill(x=0, y=0, h=scrh)
+            elif key == ord('t'):
+                view.redraw()
+            elif key in (ord('\n'), curses.KEY_ENTER, ord(' '), ord('+'), ord('='), ord('-')):
+                view.update_status()
+        self.use(self.current)
+
+    #show everything drawn since the last frame
+    def refresh(self):
+        if len(self.views) == 1:
+            self.stdscr.refresh()
+            return
+        for view in self.views:
+            view.screen.noutrefresh()
+        curses.doupdate()
+
 def main(stdscr):
-    global paused, current_reader, scrw, scrh, ch_initial, pos_initial, pos_percent
+    global paused, current_reader, scrw, scrh, ch_initial, pos_initial, pos_percent, first_frame_time
     curses.start_color()
     curses.use_default_colors()
     stdscr.idlok(True)
     stdscr.scrollok(True)
     stdscr.immedok(False)
     stdscr.nodelay(True)
+    get_user_tracks()
     for pair, background in region_colors.items():
         for offset, foreground in nucleotide_colors.items():
             curses.init_pair(pair + offset, foreground, background)
-    curses.init_pair(PAIR_HIGHLIGHT, 0, other_colors[PAIR_HIGHLIGHT])
+    for pair in other_colors.keys():
+        curses.init_pair(pair, 0, other_colors[pair])
 
     reader = Reader(ch_initial, pos_initial, pos_percent)
     view = View(reader, stdscr)
     view.fill(x=0, y=0, h=scrh)
+    stdscr.refresh()
+    if launch_time is not None:
+        first_frame_time = time.perf_counter()
+
+    recorder = None
+    if record_path:
+        import replay
+        recorder = replay.Recorder(record_path, view)
+
+    asyncio.run(Controller(view, stdscr, recorder).run())
+    if recorder:
+        recorder.close()
+
+#reads keys, scrolls by itself and draws frames as separate tasks, so that keys
+#pressed while a frame is drawn are read as soon as possible and acted on together
+class Controller:
+    #seconds between checks for keys (and resizing), besides when input arrives
+    poll_interval = 0.05
+    #most seconds of scrolling by itself to catch up on at once, after a stall
+    autoscroll_backlog = 1
+
+    def __init__(self, view, stdscr, recorder=None):
+        self.panes = Panes(view, stdscr)
+        self.stdscr = stdscr
+        self.recorder = recorder
+        #what to do in the next frame, in order: ('scroll', lines), ('tick', lines) or ('key', key)
+        self.events = []
+        self.wake = None
+        self.exit = False
+        #seconds taken to draw a frame, averaged over the last few
+        self.frame_cost = 0
+        #when scrolling by itself (re)started, at how many seconds a line, and lines scrolled since
+        self.autoscroll_origin = 0
+        self.line_time = 0
+        self.autoscroll_lines = 0
+
+    #add an event, merging it into the last one if both scroll
+    def add_event(self, kind, value):
+        if self.events and kind != 'key' and self.events[-1][0] == kind:
+            self.events[-1] = (kind, self.events[-1][1] + value)
+        else:
+            self.events.append((kind, value))
+        self.wake.set()
+
+    #read all keys waiting
+    def read_keys(self):
+        key = self.stdscr.getch()
+        while key != -1:
+            if key == curses.KEY_DOWN:
+                self.add_event('scroll', 1)
+            elif key == curses.KEY_UP:
+                self.add_event('scroll', -1)
+            else:
+                self.add_event('key', key)
+            key = self.stdscr.getch()
 
-    exit = False
-    while not exit:
-        if not paused:
-            view.scroll_down(1)
-            time.sleep(0.1)
-        key = stdscr.getch()
-        if not paused:
-            while key in [curses.KEY_DOWN, curses.KEY_UP]:
-                key = stdscr.getch()
-        if key == curses.KEY_RESIZE:
-            H, W = view.screen.getmaxyx()
-            view.resize(W, H)
-        elif key == ord('\n') or key == curses.KEY_ENTER or key == ord(' '):
-            paused = not paused
-        elif key == curses.KEY_DOWN:
-            view.scroll_down(1)
-        elif key == curses.KEY_UP:
-            view.scroll_up(1)
-        elif key == 27:
-            exit = True
+    async def read_input(self):
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_reader(sys.stdin.fileno(), self.read_keys)
+        except (NotImplementedError, ValueError, OSError):
+            pass
+        while not self.exit:
+            self.read_keys()
+            await asyncio.sleep(self.poll_interval)
+
+    #scroll by itself at display['speed'] base-pairs per second
+    #each line is due at a fixed time from the start, so drawing doesn't slow it down;
+    #when lines are due faster than frames can be drawn, several are scrolled at once
+    async def autoscroll(self):
+        while not self.exit:
+            line_time = (scrw-1) / display['speed']
+            now = time.perf_counter()
+            if paused or line_time != self.line_time:
+                self.autoscroll_origin = now
+                self.line_time = line_time
+                self.autoscroll_lines = 0
+            deadline = self.autoscroll_origin + (self.autoscroll_lines + 1)*line_time
+            await asyncio.sleep(max(deadline - now, 1/max(display['frame rate'], 1), self.frame_cost))
+            if paused or line_time != self.line_time:
+                continue
+            lines = int((time.perf_counter() - self.autoscroll_origin) / line_time) - self.autoscroll_lines
+            if lines > self.autoscroll_backlog / line_time:
+                #stalled (such as while typing in a prompt), so start again from here
+                self.line_time = 0
+                continue
+            if lines > 0:
+                self.autoscroll_lines += lines
+                self.add_event('tick', lines)
+
+    #act on all events since the last frame, then draw it
+    def draw_frame(self):
+        events = self.events
+        self.events = []
+        panes = self.panes
+        for kind, value in events:
+            #only the first pane is recorded, as if it were the whole screen
+            if kind == 'key':
+                height = panes.heights[0]
+                if panes.handle_key(value):
+                    if self.recorder and panes.heights[0] != height:
+                        self.recorder.key(curses.KEY_RESIZE)
+                    continue
+                for i in panes.get_scrolled(value):
+                    if not handle_key(panes.use(i), value):
+                        self.exit = True
+                        return
+                    if self.recorder and i == 0:
+                        self.recorder.key(value)
+                panes.share_key(value)
+                continue
+            for i in panes.get_scrolled():
+                panes.use(i).scroll(value)
+                if self.recorder and i == 0:
+                    if kind == 'tick':
+                        self.recorder.tick(value)
+                    else:
+                        self.recorder.key(curses.KEY_DOWN if value > 0 else curses.KEY_UP, abs(value))
+        panes.use(panes.current)
+        panes.refresh()
+
+    #draw frames when there are events, no more often than the frame rate allows
+    async def draw(self):
+        last_frame = 0
+        while not self.exit:
+            await self.wake.wait()
+            wait = last_frame + 1/max(display['frame rate'], 1) - time.perf_counter()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.wake.clear()
+            start = time.perf_counter()
+            self.draw_frame()
+            last_frame = time.perf_counter()
+            self.frame_cost = 0.75*self.frame_cost + 0.25*(last_frame - start)
+
+    async def run(self):
+        self.wake = asyncio.Event()
+        tasks = [asyncio.create_task(self.read_input()), asyncio.create_task(self.autoscroll())]
+        await self.draw()
+        for task in tasks:
+            task.cancel()
+        try:
+            asyncio.get_running_loop().remove_reader(sys.stdin.fileno())
+        except (NotImplementedError, ValueError, OSError):
+            pass
+
+#act on a key pressed while viewing; returns False to exit
+def handle_key(view, key):
+    global paused
+    if key == curses.KEY_RESIZE:
+        H, W = view.screen.getmaxyx()
+        view.resize(W, H)
+    elif key == ord('\n') or key == curses.KEY_ENTER or key == ord(' '):
+        paused = not paused
+        view.update_status()
+    elif key == ord('+') or key == ord('='):
+        display['speed'] = min(display['speed']*2, speed_limits[1])
+        view.update_status()
+    elif key == ord('-'):
+        display['speed'] = max(display['speed']//2, speed_limits[0])
+        view.update_status()
+    elif key == curses.KEY_DOWN:
+        view.scroll_down(1)
+    elif key == curses.KEY_UP:
+        view.scroll_up(1)
+    elif key == curses.KEY_NPAGE:
+        view.scroll(scrh)
+    elif key == curses.KEY_PPAGE:
+        view.scroll(-scrh)
+    elif key == ord('j'):
+        view.jump()
+    elif key == ord('p'):
+        view.goto_position()
+    elif key == ord('g'):
+        view.goto_gene()
+    elif key == ord('f'):
+        view.choose_feature_type()
+    elif key == ord(']'):
+        view.goto_feature(True)
+    elif key == ord('['):
+        view.goto_feature(False)
+    elif key == ord('s'):
+        view.toggle_strand()
+    elif key == ord('t'):
+        view.toggle_translation()
+    elif key == ord('v'):
+        view.toggle_variants()
+    elif key == ord('u'):
+        view.toggle_tracks()
+    elif key == 27:
+        return False
+    return True
 
 def index_closest(list, val):
     pos = bisect.bisect_left(list, val)
@@ -907,6 +1845,7 @@ def get_config_color(dict, key, section, option):
         return
 
 def parse_config():
+    import configparser
     config = configparser.ConfigParser()
     config_path = os.path.join(path, "config.ini")
     config.read(config_path)
@@ -927,8 +1866,30 @@ def parse_config():
         get_config_color(region_colors, PAIR_TRNA, section, 'tRNA')
         get_config_color(region_colors, PAIR_RRNA, section, 'rRNA')
         get_config_color(region_colors, PAIR_MIRNA, section, 'miRNA')
+        get_config_color(region_colors, PAIR_SMALL_RNA, section, 'small RNA')
+        get_config_color(region_colors, PAIR_REGULATORY, section, 'regulatory')
     if 'Other Colors' in config:
+        section = config['Other Colors']
         get_config_color(other_colors, PAIR_HIGHLIGHT, section, 'highlight')
+        get_config_color(other_colors, PAIR_SNV, section, 'SNV')
+        get_config_color(other_colors, PAIR_INDEL, section, 'indel')
+    if 'Display' in config:
+        section = config['Display']
+        display['dim repeats'] = section.getboolean('dim repeats', display['dim repeats'])
+        display['translate'] = section.getboolean('translate', display['translate'])
+        display['variants'] = section.getboolean('variants', display['variants'])
+        display['tracks'] = section.getboolean('tracks', display['tracks'])
+        display['frame rate'] = section.getint('frame rate', display['frame rate'])
+        display['speed'] = min(max(section.getint('speed', display['speed']), speed_limits[0]), speed_limits[1])
+    if 'Tracks' in config:
+        section = config['Tracks']
+        for name in section.keys():
+            get_config_color(track_colors, name, section, name)
+    if 'Readers' in config:
+        section = config['Readers']
+        reader_pool['readers'] = section.getint('open', reader_pool['readers'])
+        reader_pool['memory'] = section.getint('memory', reader_pool['memory'] >> 20) << 20
+        reader_pool['rows'] = section.getint('rows', reader_pool['rows'])
 
 def get_start_pos():
     global ch_initial, pos_initial, pos_percent, paused
@@ -937,6 +1898,16 @@ def get_start_pos():
         match = re.fullmatch(r'([1-9XY]|1\d|2[0-2]|mt)\s*(\.(-?\d+%?))?', arg)
         if match:
             break
+        #positions in another assembly, such as hg19:7.140453136, are lifted over
+        prefixed = liftover.parse_prefixed(arg)
+        if prefixed and prefixed[3] is None:
+            target = liftover.lift(*prefixed[0:3])
+            if target is None:
+                print("Position not lifted from {}: {}".format(prefixed[0], arg))
+                sys.exit(1)
+            ch_initial, pos_initial = target[0], target[1]
+            paused = True
+            return
     if match:
         ch_initial = match.group(1)
         pos_str = match.group(3)
@@ -948,8 +1919,28 @@ def get_start_pos():
                 pos_initial = int(pos_str)
             paused = True
 
+def get_gene_pos():
+    global ch_initial, pos_initial, paused
+    match = None
+    for arg in sys.argv[1:]:
+        match = re.fullmatch(r'gene=(\S+)', arg)
+        if match:
+            break
+    if match:
+        index = genes.GeneIndex.get_index()
+        if index is None:
+            print("No gene index present; run setup again to create it")
+            sys.exit(1)
+        record = index.find(match.group(1))
+        if record is None:
+            print("Gene not found: " + match.group(1))
+            sys.exit(1)
+        ch_initial = record[1]
+        pos_initial = record[2]
+        paused = True
+
 def parse_options():
-    global highlight
+    global highlight, show_startup_time, profiling, record_path
     get_start_pos()
     match = None
     for arg in sys.argv[1:]:
@@ -962,8 +1953,34 @@ def parse_options():
             hl = hl.lower()
             if hl in highlight:
                 highlight[hl] = True
-
-parse_config()
-parse_options()
-scrw, scrh = shutil.get_terminal_size((scrw, scrh))
-curses.wrapper(main)
+    if "startup-time" in sys.argv[1:]:
+        show_startup_time = True
+    if [arg for arg in sys.argv[1:] if re.match(r'stats(-overlay|-json=|$)', arg)]:
+        import instrument
+        instrument.parse_options()
+        instrument.install(sys.modules[__name__])
+        profiling = True
+    for arg in sys.argv[1:]:
+        match = re.fullmatch(r'record=(.+)', arg)
+        if match:
+            record_path = match.group(1)
+    get_gene_pos()
+
+#run the viewer with the command line options, reporting startup latency if asked to
+def run():
+    global scrw, scrh, launch_time
+    import shutil
+    if launch_time is None:
+        launch_time = time.perf_counter()
+    parse_config()
+    parse_options()
+    scrw, scrh = shutil.get_terminal_size((scrw, scrh))
+    curses.wrapper(main)
+    if show_startup_time:
+        print("Time to first frame: {:.1f} ms".format((first_frame_time - launch_time)*1000))
+    if profiling:
+        import instrument
+        instrument.report()
+
+if __name__ == '__main__':
+    run()